@@ -0,0 +1,84 @@
+'''
+Compares the vectorized hour binning of reports.binning with the loop
+over the hours of each record it replaced, after checking that both
+give the same minutes. Usage: python -m benchmarks.binning [records]
+'''
+
+import sys
+import pytz
+import random
+from timeit import timeit
+from datetime import date, datetime, timedelta
+
+from reports import binning
+
+
+def loop(
+    starts: list[datetime], ends: list[datetime], day: date, timezone
+) -> list[float]:
+    '''
+    Walks each record hour by hour in the local time, like
+    reports.utils.add_time did, without its truncation at midnight
+    '''
+    timeline = [0.0] * 24
+    midnight = timezone.localize(datetime.combine(day, datetime.min.time()))
+    following = timezone.localize(
+        datetime.combine(day + timedelta(days=1), datetime.min.time())
+    )
+
+    for start, end in zip(starts, ends):
+        start = max(pytz.utc.localize(start), midnight)
+        end = min(pytz.utc.localize(end), following)
+
+        while start < end:
+            local = start.astimezone(timezone)
+            hour = local.replace(minute=0, second=0, microsecond=0)
+            boundary = timezone.normalize(hour + timedelta(hours=1))
+            part = min(end, boundary)
+
+            timeline[local.hour] += (part - start).total_seconds() / 60
+            start = part
+
+    return timeline
+
+
+def generate(count: int, day: date, timezone):
+    '''
+    Records of up to three hours around the local day, some of them
+    crossing midnight, as naive UTC dates
+    '''
+    midnight = timezone.localize(datetime.combine(day, datetime.min.time()))
+    midnight = midnight.astimezone(pytz.utc).replace(tzinfo=None)
+    starts, ends = [], []
+
+    for _ in range(count):
+        start = midnight + timedelta(seconds=random.randint(-3 * 3600, 86400))
+        starts.append(start)
+        ends.append(start + timedelta(seconds=random.randint(1, 3 * 3600)))
+
+    return starts, ends
+
+
+def main(count: int):
+    timezone = pytz.timezone('Europe/Kiev')
+    day = date.today()
+    starts, ends = generate(count, day, timezone)
+
+    expected = loop(starts, ends, day, timezone)
+    actual = binning.timeline(starts, ends, day, timezone)
+    difference = max(abs(a - b) for a, b in zip(expected, actual))
+
+    if difference > 1e-6:
+        sys.exit(f'The results differ by {difference} minutes')
+
+    number = 20
+    for name, function in (('loop', loop), ('numpy', binning.timeline)):
+        elapsed = timeit(
+            lambda: function(starts, ends, day, timezone), number=number
+        )
+        print(f'{name:>6}: {elapsed / number * 1000:.3f} ms per call '
+              f'({count} records)')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,287 @@
+'''
+Measures the reports on synthetic accounts seeded into the database
+from settings.py, which should be a local or staging one. For each
+account the queries of the task, folder and account reports and the
+drawing of their charts by both backends are timed separately, and the
+peak RSS of the process is recorded. The results are written to a JSON
+file to be compared across commits. The accounts have negative ids,
+which are not used by Telegram, and are deleted afterwards unless
+--keep is given.
+
+Usage: python -m benchmarks.reports [--output FILE] [--repeat N]
+    [--limit DURATIONS] [--keep]
+'''
+
+import json
+import random
+import asyncio
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+from time import perf_counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as tz
+
+import settings
+from aiogram.utils.i18n import I18n
+
+from models import database, utc_now, Account, Task, Duration
+from reports import account as everything, folder, render, task, text
+
+
+# Numbers of tasks and time records of the synthetic accounts
+SCENARIOS = [
+    (1, 10),
+    (1, 1_000),
+    (10, 1_000),
+    (10, 10_000),
+    (100, 10_000),
+    (100, 100_000),
+    (500, 100_000),
+]
+# The accounts take them in turn
+TIMEZONES = [
+    'UTC',
+    'Europe/Kiev',
+    'America/New_York',
+    'Asia/Kolkata',
+    'Australia/Adelaide',
+]
+# The records are spread over the days before now, beyond the reports
+SPAN = timedelta(days=60)
+BATCH = 10_000
+
+REPORTS = [
+    ('task.today', lambda __, first: task.today_chart(first)),
+    ('task.week', lambda __, first: task.days_chart(first, 6)),
+    ('task.month', lambda __, first: task.days_chart(first, 29)),
+    ('folder.today', lambda account, __: folder.today_chart(account, None)),
+    ('folder.week', lambda account, __: folder.days_chart(account, None, 6)),
+    ('folder.month', lambda account, __: folder.days_chart(account, None, 29)),
+    ('account.month', lambda account, __: everything.days_chart(account, 29)),
+]
+
+
+def peak_rss() -> int:
+    '''
+    Peak resident set size of the process in bytes (Linux reports
+    kilobytes, macOS bytes)
+    '''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == 'Darwin' else peak * 1024
+
+
+def summary(samples: list[float]) -> dict[str, float]:
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'max': max(samples),
+    }
+
+
+@contextmanager
+def without_rollup():
+    '''
+    Transaction in which the rollup trigger is disabled, so that the
+    records are inserted or deleted without recomputing the days after
+    each of them. The duration table is locked until the end of it.
+    '''
+    with database.atomic():
+        database.execute_sql(
+            'ALTER TABLE duration DISABLE TRIGGER duration_rollup'
+        )
+        yield
+        database.execute_sql(
+            'ALTER TABLE duration ENABLE TRIGGER duration_rollup'
+        )
+
+
+def records(tasks: list[int], account_id: int, count: int):
+    '''
+    Time records of random tasks of the account that do not intersect,
+    one in each of the equal parts of the span before now
+    '''
+    now = utc_now().replace(tzinfo=None)
+    slot = SPAN / count
+
+    for index in range(count):
+        start = now - SPAN + slot * index + slot * random.uniform(0, 0.3)
+        yield {
+            'task': random.choice(tasks),
+            'account': account_id,
+            'start': start,
+            'end': start + slot * random.uniform(0.1, 0.6),
+        }
+
+
+def seed(account_id: int, timezone: str, tasks: int, durations: int):
+    with database:
+        Account.create(id=account_id, timezone=timezone)
+        Task.insert_many([
+            {'account': account_id, 'name': f'Task {index}'}
+            for index in range(tasks)
+        ]).execute()
+        ids = [
+            id for id, in
+            Task.select(Task.id).where(Task.account == account_id).tuples()
+        ]
+
+        with without_rollup():
+            rows = list(records(ids, account_id, durations))
+            for index in range(0, len(rows), BATCH):
+                Duration.insert_many(rows[index:index + BATCH]).execute()
+
+        database.execute_sql('SELECT rollup_rebuild(%s)', (account_id,))
+
+
+def remove(account_id: int):
+    with database:
+        with without_rollup():
+            Account.delete().where(Account.id == account_id).execute()
+
+
+async def measure(account_id: int, repeat: int) -> dict:
+    account = Account.get_by_id(account_id)
+    first = (
+        Task.select()
+        .where(Task.account == account)
+        .order_by(Task.id)
+        .first()
+    )
+    first.account = account
+    results = {}
+
+    for name, build in REPORTS:
+        queries, images, texts = [], [], []
+        chart, size = None, 0
+
+        for __ in range(repeat):
+            started_at = perf_counter()
+            try:
+                chart = await build(account, first)
+            except ValueError:
+                chart = None
+                break
+            queries.append(perf_counter() - started_at)
+
+            started_at = perf_counter()
+            size = len(render.render(chart))
+            images.append(perf_counter() - started_at)
+
+            started_at = perf_counter()
+            text.render(chart)
+            texts.append(perf_counter() - started_at)
+
+        if chart is None:
+            # There are no records on the days of the report
+            results[name] = {'empty': True}
+            continue
+
+        results[name] = {
+            'series': len(chart.series),
+            'query': summary(queries),
+            'render': summary(images),
+            'render_text': summary(texts),
+            'image_size': size,
+            'peak_rss': peak_rss(),
+        }
+
+    return results
+
+
+def revision() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(output: str, repeat: int, limit: int | None, keep: bool):
+    i18n = I18n(
+        path=settings.LOCALES_PATH, default_locale=settings.LANGUAGE_CODE
+    )
+    random.seed(0)
+
+    started_at = datetime.now(tz.utc)
+    baseline = peak_rss()
+    # Imports matplotlib and loads the fonts, as the pool workers do
+    render.warm_up()
+
+    report = {
+        'revision': revision(),
+        'started_at': started_at.isoformat(),
+        'python': platform.python_version(),
+        'repeat': repeat,
+        'peak_rss_baseline': baseline,
+        'peak_rss_warm': peak_rss(),
+        'scenarios': [],
+    }
+
+    scenarios = [
+        (tasks, durations) for tasks, durations in SCENARIOS
+        if limit is None or durations <= limit
+    ]
+
+    for index, (tasks, durations) in enumerate(scenarios):
+        account_id = -1 - index
+        timezone = TIMEZONES[index % len(TIMEZONES)]
+        remove(account_id)
+
+        seeded_at = perf_counter()
+        seed(account_id, timezone, tasks, durations)
+        seeding = perf_counter() - seeded_at
+
+        try:
+            with database, i18n.context(), i18n.use_locale('en'):
+                reports = await measure(account_id, repeat)
+        finally:
+            if not keep:
+                remove(account_id)
+
+        report['scenarios'].append({
+            'tasks': tasks,
+            'durations': durations,
+            'timezone': timezone,
+            'seeding': seeding,
+            'reports': reports,
+        })
+        print(f'{tasks} tasks, {durations} records, {timezone}: '
+              f'seeded in {seeding:.1f} s')
+
+        for name, result in reports.items():
+            if result.get('empty'):
+                print(f'  {name:>12}: no records')
+                continue
+            print(f'  {name:>12}: query {result["query"]["median"]:.4f} s, '
+                  f'render {result["render"]["median"]:.4f} s, '
+                  f'text {result["render_text"]["median"]:.5f} s')
+
+    report['peak_rss'] = peak_rss()
+
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    print(f'Peak RSS {report["peak_rss"] / 2**20:.1f} MiB, '
+          f'the results are written to {output}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--output', default='benchmark-reports.json')
+    parser.add_argument(
+        '--repeat', type=int, default=5, help='measurements of each report'
+    )
+    parser.add_argument(
+        '--limit', type=int, help='skip the accounts with more records'
+    )
+    parser.add_argument(
+        '--keep', action='store_true', help='keep the synthetic accounts'
+    )
+    args = parser.parse_args()
+
+    asyncio.run(main(args.output, args.repeat, args.limit, args.keep))
@@ -0,0 +1,263 @@
+'''
+Checks the daily rollup kept by the triggers against the NumPy binning
+of reports.binning over the time records, and compares reading a month
+of days from the rollup with binning the records. Synthetic accounts
+are seeded into the database from settings.py as by benchmarks.reports,
+one per time zone, with records around the changes of the clocks of the
+year and records crossing midnight, and deleted afterwards. The records are
+inserted one by one, so the triggers recompute the days as they do for
+the handlers. The script exits with an error if the hours differ.
+
+Usage: python -m benchmarks.rollup [--records N] [--year YEAR]
+'''
+
+import sys
+import pytz
+import random
+import argparse
+from time import perf_counter
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from reports import binning
+from models import database, Account, Task, Duration, DailyRollup
+from .reports import TIMEZONES, remove
+
+
+# The accounts of benchmarks.reports use the ids from -1 down
+FIRST_ID = -101
+TASKS = 3
+# Seconds of the hours may differ by the rounding of the float sums
+TOLERANCE = 1e-6
+
+
+def local_days(start: datetime, end: datetime, timezone) -> list[date]:
+    '''
+    Local days touched by the record of naive UTC dates
+    '''
+    first = pytz.utc.localize(start).astimezone(timezone).date()
+    last = pytz.utc.localize(end).astimezone(timezone).date()
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+def binned(records, timezone) -> dict[tuple[int, date, int], float]:
+    '''
+    Seconds of each task, local day and hour of the records computed by
+    reports.binning. A repeated hour on the day the clocks go back is a
+    single bin, as in the rollup.
+    '''
+    days: dict[tuple[int, date], tuple[list, list]] = defaultdict(
+        lambda: ([], [])
+    )
+    for task_id, start, end in records:
+        for day in local_days(start, end, timezone):
+            starts, ends = days[(task_id, day)]
+            starts.append(start)
+            ends.append(end)
+
+    seconds: dict[tuple[int, date, int], float] = defaultdict(float)
+    for (task_id, day), (starts, ends) in days.items():
+        hours = binning.timeline(starts, ends, day, timezone)
+        for hour, value in enumerate(hours):
+            if value:
+                seconds[(task_id, day, hour)] = value * 60
+
+    return seconds
+
+
+def transitions(timezone, year: int) -> list[datetime]:
+    '''
+    Naive UTC dates of the changes of the clocks in the year
+    '''
+    return [
+        moment for moment in getattr(timezone, '_utc_transition_times', [])
+        if moment.year == year
+    ]
+
+
+def records(tasks: list[int], timezone, year: int, count: int):
+    '''
+    Time records of the tasks that do not intersect: one spanning each
+    change of the clocks, one crossing the local midnight after it, and
+    random ones of up to three hours in the equal parts of the year
+    '''
+    spans = []
+    for moment in transitions(timezone, year):
+        spans.append(
+            (moment - timedelta(hours=2), moment + timedelta(hours=2))
+        )
+
+        local = moment.replace(tzinfo=pytz.utc).astimezone(timezone)
+        following = local.date() + timedelta(days=1)
+        midnight = timezone.localize(
+            datetime.combine(following, datetime.min.time())
+        ).astimezone(pytz.utc).replace(tzinfo=None)
+        spans.append(
+            (midnight - timedelta(minutes=50), midnight + timedelta(hours=1))
+        )
+
+    first = datetime(year, 1, 1)
+    slot = (datetime(year + 1, 1, 1) - first) / count
+
+    for index in range(count):
+        # The binning works with whole seconds
+        start = (first + slot * index).replace(microsecond=0) + timedelta(
+            seconds=random.randint(0, 3600)
+        )
+        end = start + timedelta(seconds=random.randint(1, 3 * 3600))
+
+        # The records around the changes of the clocks are kept
+        if not any(start <= until and end >= since for since, until in spans):
+            spans.append((start, end))
+
+    spans.sort()
+    return [(random.choice(tasks), start, end) for start, end in spans]
+
+
+def seed(account_id: int, name: str, year: int, count: int):
+    timezone = pytz.timezone(name)
+
+    with database:
+        Account.create(id=account_id, timezone=name)
+        tasks = [
+            Task.create(account=account_id, name=f'Task {index}').id
+            for index in range(TASKS)
+        ]
+
+    rows = records(tasks, timezone, year, count)
+    started_at = perf_counter()
+
+    for task_id, start, end in rows:
+        with database:
+            Duration.insert(
+                task=task_id, account=account_id, start=start, end=end
+            ).execute()
+
+    return rows, perf_counter() - started_at
+
+
+def compare(account_id: int, rows, timezone) -> float:
+    '''
+    Returns the largest difference of the seconds of an hour between
+    the rollup and the binning, and of a day between its total and hours
+    '''
+    expected = binned(rows, timezone)
+    actual: dict[tuple[int, date, int], float] = defaultdict(float)
+    difference = 0.0
+
+    with database:
+        rollups = (
+            DailyRollup
+            .select()
+            .join(Task)
+            .where(Task.account == account_id)
+        )
+        for rollup in rollups:
+            for hour, seconds in enumerate(rollup.hours):
+                if seconds:
+                    actual[(rollup.task_id, rollup.day, hour)] = seconds
+            difference = max(
+                difference, abs(sum(rollup.hours) - rollup.seconds)
+            )
+
+    for key in expected.keys() | actual.keys():
+        difference = max(difference, abs(expected[key] - actual[key]))
+
+    return difference
+
+
+def read_month(account_id: int, timezone, last: date) -> tuple[float, float]:
+    '''
+    Seconds of 30 days up to the last one read from the rollup and
+    binned from the records, with the time each of them took
+    '''
+    first = last - timedelta(days=29)
+    since = timezone.localize(datetime.combine(first, datetime.min.time()))
+    until = timezone.localize(
+        datetime.combine(last + timedelta(days=1), datetime.min.time())
+    )
+    since = since.astimezone(pytz.utc).replace(tzinfo=None)
+    until = until.astimezone(pytz.utc).replace(tzinfo=None)
+
+    with database:
+        started_at = perf_counter()
+        (
+            DailyRollup
+            .select(DailyRollup.day, DailyRollup.seconds)
+            .join(Task)
+            .where(
+                Task.account == account_id,
+                DailyRollup.day.between(first, last)
+            )
+            .tuples()
+            .execute()
+        )
+        rollup = perf_counter() - started_at
+
+        started_at = perf_counter()
+        rows = (
+            Duration
+            .select(Duration.task, Duration.start, Duration.end)
+            .where(
+                Duration.account == account_id,
+                Duration.end > since,
+                Duration.start < until
+            )
+            .tuples()
+        )
+        starts, ends = [], []
+        for __, start, end in rows:
+            starts.append(start)
+            ends.append(end)
+        for index in range(30):
+            binning.timeline(
+                starts, ends, first + timedelta(days=index), timezone
+            )
+        raw = perf_counter() - started_at
+
+    return rollup, raw
+
+
+def main(count: int, year: int):
+    random.seed(0)
+    failed = False
+
+    for index, name in enumerate(TIMEZONES):
+        account_id = FIRST_ID - index
+        timezone = pytz.timezone(name)
+        remove(account_id)
+
+        try:
+            rows, inserting = seed(account_id, name, year, count)
+            difference = compare(account_id, rows, timezone)
+            rollup, raw = read_month(
+                account_id, timezone, date(year, 12, 31)
+            )
+        finally:
+            remove(account_id)
+
+        status = 'OK' if difference <= TOLERANCE else 'DIFFERENT'
+        failed = failed or status != 'OK'
+
+        print(f'{name}: {len(rows)} records inserted in {inserting:.1f} s, '
+              f'largest difference {difference:.2e} s ({status}), month '
+              f'from the rollup {rollup * 1000:.2f} ms, '
+              f'from the records {raw * 1000:.2f} ms')
+
+    if failed:
+        sys.exit('The rollup differs from the binning of the records')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--records', type=int, default=1000,
+        help='random records of each account'
+    )
+    parser.add_argument(
+        '--year', type=int, default=datetime.now().year - 1,
+        help='year of the records'
+    )
+    args = parser.parse_args()
+
+    main(args.records, args.year)
@@ -0,0 +1,125 @@
+'''
+Routing of callback queries by the opcode of their action. Instead of
+checking the filters of every handler in turn, the handlers of the action
+decoded by ActionMiddleware are found with one dictionary lookup, so the
+cost of routing does not grow with the number of actions.
+'''
+
+import logging
+from time import perf_counter
+from typing import Any, Callable, NamedTuple, Sequence
+
+from aiogram.types import CallbackQuery
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.dispatcher.event.handler import FilterObject, HandlerObject
+from aiogram.dispatcher.middlewares.manager import MiddlewareManager
+
+from link import Action
+
+
+logger = logging.getLogger(__name__)
+
+
+class Entry(NamedTuple):
+    handler: HandlerObject
+    middlewares: Sequence[Callable]
+
+
+class Timing:
+    '''
+    Number of the dispatched callback queries of an action
+    and the time spent on them, in seconds
+    '''
+
+    __slots__ = ('calls', 'total', 'max')
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed: float):
+        self.calls += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+
+class ActionTable:
+    '''
+    Handlers of callback queries keyed by the opcode of the action. Several
+    handlers of the same action are tried in the order of registration
+    by their remaining filters (e.g. the state), the middlewares of the
+    table are applied to its handlers only, like the inner middlewares
+    of a router. The tables of the modules are merged with include.
+    '''
+
+    def __init__(self, middlewares: Sequence[Callable] = ()) -> None:
+        self.middlewares = list(middlewares)
+        self.entries: dict[str, list[Entry]] = {}
+        self.timings: dict[str, Timing] = {}
+
+    def register(self, *ops: str, filters: Sequence[Callable] = ()):
+        '''
+        Decorator registering the handler of the actions,
+        the handler itself is returned unchanged
+        '''
+
+        def decorator(callback: Callable) -> Callable:
+            handler = HandlerObject(
+                callback=callback,
+                filters=[FilterObject(filter) for filter in filters]
+            )
+            for op in ops:
+                entry = Entry(handler, self.middlewares)
+                self.entries.setdefault(op, []).append(entry)
+            return callback
+
+        return decorator
+
+    def include(self, *tables: 'ActionTable'):
+        for table in tables:
+            for op, entries in table.entries.items():
+                self.entries.setdefault(op, []).extend(entries)
+
+    async def dispatch(self, callback: CallbackQuery, **data: Any) -> Any:
+        '''
+        Handler of all callback queries, which calls the handler of
+        the action or lets the query be processed by the routers
+        '''
+        action = data.get('action')
+        if not isinstance(action, Action):
+            raise SkipHandler()
+
+        for entry in self.entries.get(action.op, ()):
+            data['handler'] = entry.handler
+            passed, kwargs = await entry.handler.check(
+                callback, **data, params=action.params
+            )
+            if not passed:
+                continue
+
+            handler = MiddlewareManager.wrap_middlewares(
+                entry.middlewares, entry.handler.call
+            )
+            started_at = perf_counter()
+
+            try:
+                return await handler(callback, kwargs)
+            finally:
+                elapsed = perf_counter() - started_at
+                self.timings.setdefault(action.op, Timing()).add(elapsed)
+                logger.debug(
+                    'Action %r handled in %.3f s', action.op, elapsed
+                )
+
+        raise SkipHandler()
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        return {
+            op: {
+                'calls': timing.calls,
+                'total': timing.total,
+                'max': timing.max,
+            }
+            for op, timing in self.timings.items()
+        }
@@ -0,0 +1,101 @@
+'''
+Prints the execution plans of the hot queries for the given account,
+so that it can be checked that they are served by the indexes from
+models.INDEXES. Usage: python explain.py <account id> [--analyze]
+'''
+
+import sys
+
+import repository
+from reports import utils
+from models import database, Account, Counter, Task, DailyRollup, Timer
+
+
+def explain(title: str, query, analyze: bool = False):
+    sql, params = query.sql()
+    options = 'ANALYZE, BUFFERS' if analyze else 'COSTS'
+    cursor = database.execute_sql(f'EXPLAIN ({options}) {sql}', params)
+    plan = [row[0] for row in cursor.fetchall()]
+
+    status = 'SEQ SCAN' if any('Seq Scan' in row for row in plan) else 'OK'
+    print(f'=== {title} [{status}]')
+    print('\n'.join(plan), end='\n\n')
+
+
+def main(account_id: int, analyze: bool = False):
+    with database:
+        account = Account.get_by_id(account_id)
+        folder = account.folders.first()  # type: ignore
+        task = account.tasks.order_by(Task.id.desc()).first()  # type: ignore
+        timezone = utils.get_timezone(account.timezone)
+        first = utils.period(timezone, 29)[0]
+
+        # The pages following and preceding the task and the folder
+        task_folder = task.folder if task else None
+        task_cursor = (task.created_at, task.id) if task else None
+        folder_cursor = folder.id if folder else None
+
+        queries = [
+            (
+                'Counters of the account (settings, report version)',
+                Counter.select().where(Counter.account == account)
+            ),
+            (
+                'Task list of the main folder',
+                repository.task_page(account, None, 15)
+            ),
+            (
+                'Task list of a folder',
+                repository.task_page(account, folder, 15)
+            ),
+            (
+                'Next page of the task list',
+                repository.task_page(account, task_folder, 15, task_cursor)
+            ),
+            (
+                'Previous page of the task list',
+                repository.task_page(
+                    account, task_folder, 15, task_cursor, True
+                )
+            ),
+            (
+                'Task with its folder and time records (TaskMiddleware)',
+                repository.task_query(account.id, task.id if task else 0)
+            ),
+            (
+                'Folder list',
+                repository.folder_page(account, 10)
+            ),
+            (
+                'Next page of the folder list',
+                repository.folder_page(account, 10, folder_cursor)
+            ),
+            (
+                'Previous page of the folder list',
+                repository.folder_page(account, 10, folder_cursor, True)
+            ),
+            (
+                'Daily rollup of a task for the last 30 days (reports)',
+                DailyRollup.select().where(
+                    DailyRollup.task == task,
+                    DailyRollup.day >= first
+                )
+            ),
+            (
+                'Timers of the account (timer list)',
+                Timer.select(Timer, Task.id, Task.name)
+                .join(Task)
+                .where(Timer.account == account)
+                .order_by(Timer.started_at)
+            ),
+        ]
+
+        for title, query in queries:
+            explain(title, query, analyze)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or not sys.argv[1].isdigit():
+        sys.exit(__doc__)
+
+    main(int(sys.argv[1]), '--analyze' in sys.argv)
@@ -0,0 +1,175 @@
+'''
+Export of the time records of an account for a period. The records are
+read from a server-side cursor in batches by the database threads,
+written as CSV or NDJSON and compressed with gzip while the file is
+uploaded, so the memory used does not depend on the number of records.
+'''
+
+import io
+import csv
+import json
+import zlib
+import pytz
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator
+from peewee import JOIN, ModelSelect
+
+import repository
+from aiogram import Bot, types
+from reports.utils import get_timezone
+from models import database, Account, Folder, Task, Duration
+
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+FORMATS = (CSV, NDJSON)
+
+COLUMNS = ('task', 'folder', 'start', 'end', 'notes')
+# Records fetched from the cursor at once
+BATCH = 2000
+
+
+def query(
+    account: Account, lower: datetime | None, upper: datetime | None
+) -> ModelSelect:
+    '''
+    Time records of the account started within the range [lower, upper)
+    of naive UTC dates, either end may be open
+    '''
+    query = (
+        Duration
+        .select(
+            Task.name, Folder.name, Duration.start, Duration.end,
+            Duration.notes
+        )
+        .join(Task)
+        .join(Folder, JOIN.LEFT_OUTER)
+        .where(Task.account == account)
+        .order_by(Duration.start, Duration.id)
+    )
+
+    if lower is not None:
+        query = query.where(Duration.start >= lower)
+    if upper is not None:
+        query = query.where(Duration.start < upper)
+
+    return query
+
+
+@repository.threaded
+def has_records(
+    account: Account, lower: datetime | None, upper: datetime | None
+) -> bool:
+    return query(account, lower, upper).exists()
+
+
+class Cursor:
+    '''
+    Server-side cursor in a repository session of its own, whose
+    connection and transaction are held until it is closed. The owner
+    closes it, an upload that fails or is cancelled does not close the
+    stream of the file reading from it.
+    '''
+
+    def __init__(self, query: ModelSelect) -> None:
+        self.sql, self.params = query.sql()
+        self.session = repository.Session()
+        self.cursor = None
+
+    def fetch(self, size: int) -> list[tuple]:
+        if self.cursor is None:
+            self.cursor = database.connection().cursor(name='export')
+            self.cursor.execute(self.sql, self.params)
+        return self.cursor.fetchmany(size)
+
+    def discard(self):
+        '''
+        Closes the cursor, which is not valid after the transaction,
+        and rolls back the transaction as the cursor only reads
+        '''
+        cursor, self.cursor = self.cursor, None
+
+        try:
+            if cursor is not None:
+                self.session.run(cursor.close)
+        finally:
+            self.session.finish(commit=False)
+
+    async def batches(self, size: int = BATCH) -> AsyncIterator[list[tuple]]:
+        loop = asyncio.get_running_loop()
+
+        while rows := await loop.run_in_executor(
+            repository.executor, self.session.run, self.fetch, size
+        ):
+            yield rows
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(repository.finisher, self.discard)
+
+
+def encode(rows: list[tuple], kind: str, timezone) -> bytes:
+    '''
+    Writes the rows of the query as lines of the kind of the export,
+    with the dates in the time zone of the account
+    '''
+    records = [
+        (
+            task,
+            folder,
+            pytz.utc.localize(start).astimezone(timezone).isoformat(),
+            pytz.utc.localize(end).astimezone(timezone).isoformat(),
+            notes
+        )
+        for task, folder, start, end, notes in rows
+    ]
+
+    if kind == NDJSON:
+        return ''.join(
+            json.dumps(dict(zip(COLUMNS, record)), ensure_ascii=False) + '\n'
+            for record in records
+        ).encode()
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(records)
+    return buffer.getvalue().encode()
+
+
+async def stream(
+    account: Account, cursor: Cursor, kind: str
+) -> AsyncIterator[bytes]:
+    '''
+    Yields the gzip compressed export as it is read from the cursor
+    '''
+    timezone = get_timezone(account.timezone)
+    # The gzip header and trailer instead of the zlib ones
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    if kind == CSV:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(COLUMNS)
+        chunk = compressor.compress(buffer.getvalue().encode())
+        if chunk:
+            yield chunk
+
+    async for rows in cursor.batches():
+        chunk = compressor.compress(encode(rows, kind, timezone))
+        if chunk:
+            yield chunk
+
+    yield compressor.flush()
+
+
+class ExportFile(types.InputFile):
+    '''
+    File uploaded while the chunks of its content are produced
+    '''
+
+    def __init__(self, chunks: AsyncIterator[bytes], filename: str) -> None:
+        super().__init__(filename=filename)
+        self.chunks = chunks
+
+    async def read(self, bot: Bot):
+        async for chunk in self.chunks:
+            yield chunk
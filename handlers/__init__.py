@@ -1,12 +1,45 @@
 from . import user
 from . import task
 from . import folder
+from . import timer
+from . import export
 
-from aiogram import Router
+from aiogram import Router, types
+from aiogram.utils.i18n import gettext as _
+from dispatch import ActionTable
 
 
 router = Router()
 
+# Callback queries are routed by the table before the routers
+actions = ActionTable()
+actions.include(
+    user.actions,
+    task.actions,
+    task.detail_actions,
+    folder.actions,
+    timer.actions,
+    timer.detail_actions,
+)
+router.callback_query.register(actions.dispatch)
+
 router.include_router(user.router)
 router.include_router(task.router)
 router.include_router(folder.router)
+router.include_router(timer.router)
+router.include_router(export.router)
+
+# Included last, it answers the callback queries that no handler has
+# processed, e.g. of the buttons sent before their data was encoded as
+# opcodes, so that the client does not wait for the answer
+fallback = Router()
+
+
+@fallback.callback_query()
+async def outdated(callback: types.CallbackQuery):
+    await callback.answer(
+        _('This button is outdated. Please open the menu again.')
+    )
+
+
+router.include_router(fallback)
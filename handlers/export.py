@@ -0,0 +1,87 @@
+import asyncio
+import settings
+from datetime import date, datetime, timedelta
+
+import link
+import export
+from models import Account
+from reports.utils import get_timezone, to_utc
+
+from aiogram import Router, types
+from aiogram.filters import Command, CommandObject
+from aiogram.utils.i18n import gettext as _
+
+
+router = Router()
+# An export holds a connection and its transaction while it is uploaded
+slots = asyncio.Semaphore(getattr(settings, 'EXPORT_CONCURRENCY', 2))
+
+
+def parse(
+    arguments: str | None, timezone
+) -> tuple[datetime | None, datetime | None, str]:
+    '''
+    Parses "[first day] [last day] [csv|ndjson]" into the range of naive
+    UTC dates of the local days and the kind of the export. Without days
+    all records are exported, with a single one those since it.
+    ValueError is raised if the arguments are invalid.
+    '''
+    kind = export.CSV
+    days: list[date] = []
+
+    for word in (arguments or '').split():
+        if word.lower() in export.FORMATS:
+            kind = word.lower()
+        else:
+            days.append(date.fromisoformat(word))
+
+    if len(days) > 2 or days != sorted(days):
+        raise ValueError()
+
+    lower = to_utc(timezone, days[0]) if days else None
+    upper = None
+    if len(days) == 2:
+        upper = to_utc(timezone, days[1] + timedelta(days=1))
+
+    return lower, upper, kind
+
+
+@router.message(
+    Command(link.Cmd.export)
+)
+async def export_records(
+    message: types.Message, account: Account, command: CommandObject
+):
+    try:
+        lower, upper, kind = parse(
+            command.args, get_timezone(account.timezone)
+        )
+    except ValueError:
+        return await message.reply(_(
+            'Send /export [first day] [last day] [csv or ndjson], with '
+            'the days as YYYY-MM-DD, e.g. /export 2024-01-01 2024-01-31. '
+            'Without the days all time records are exported.'
+        ))
+
+    if slots.locked():
+        return await message.reply(
+            _('Sorry, but too many exports are being prepared right now. '
+              'Please try again in a minute.')
+        )
+
+    async with slots:
+        if not await export.has_records(account, lower, upper):
+            return await message.reply(
+                _('There are no time records for this period.')
+            )
+
+        cursor = export.Cursor(export.query(account, lower, upper))
+        try:
+            chunks = export.stream(account, cursor, kind)
+            await message.answer_document(
+                export.ExportFile(chunks, f'time-records.{kind}.gz'),
+                caption=_('Your time records')
+            )
+        finally:
+            # Also if the upload has failed or has been cancelled
+            await cursor.close()
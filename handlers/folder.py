@@ -1,8 +1,15 @@
 import link
-from models import database, Account, Folder
-from state import CreateFolder, UpdateFolder
+import repository
+from models import Account, Folder
+from dispatch import ActionTable
+from state import (
+    CreateFolder,
+    UpdateFolder,
+    MessageRef,
+    UpdateFolderData,
+    DeleteFolderData,
+)
 
-from math import ceil
 from peewee import DoesNotExist
 
 from aiogram import Router, Bot, F, types
@@ -14,37 +21,41 @@ from aiogram.utils.formatting import Text, as_numbered_section
 
 
 router = Router()
+actions = ActionTable()
 
 
-def get_list(account: Account,
-             page: int) -> tuple[Text, types.InlineKeyboardMarkup | None]:
-
+async def get_list(
+    account: Account, cursor: int | None = None, backward: bool = False
+) -> tuple[Text, types.InlineKeyboardMarkup | None]:
+    '''
+    Renders the page of folders following the folder with the cursor
+    id, or preceding it if backward, or the first page without it
+    '''
     builder = keyboard.InlineKeyboardBuilder()
 
-    with database:
-        count = account.folders.count()  # type: ignore
-
-        if not count:
-            text = _(
-                "Sorry, but I can't show the "
-                "folders because you don't have them."
-            )
-            builder.button(
-                text=_('🆕 Create folder'),
-                callback_data=link.Callback.folder_create
-            )
-            return Text(text), builder.as_markup()
+    per_page = 10
+    folders, more = await repository.list_folders(
+        account, per_page, cursor, backward
+    )
 
-        per_page = 10
-        pages = ceil(count / per_page)
+    if not folders and cursor is None:
+        text = _(
+            "Sorry, but I can't show the "
+            "folders because you don't have them."
+        )
+        builder.button(
+            text=_('🆕 Create folder'),
+            callback_data=link.Callback.folder_create
+        )
+        return Text(text), builder.as_markup()
 
-        if page > pages or page < 0:
-            return Text('Incorrect page'), None
+    if not folders:
+        return Text('Incorrect page'), None
 
-        folders = account.folders.paginate(page, per_page)
-        folders = list(folders)  # type: ignore
+    has_previous = more if backward else cursor is not None
+    has_next = cursor is not None if backward else more
 
-    if page == 1:
+    if not has_previous:
         folders.insert(
             0, Folder(id=0, name=_('Main folder'))
         )
@@ -52,21 +63,25 @@ def get_list(account: Account,
     for number, folder in enumerate(folders, 1):
         builder.button(
             text=str(number),
-            callback_data=f'{link.Callback.folder_retrieve}/{folder.id}'
+            callback_data=link.pack(link.Callback.folder_retrieve, folder.id)
         )
 
     pagination = 0
 
-    if page > 1:
+    if has_previous:
         builder.button(
             text=_('⬅️ Previous page'),
-            callback_data=f'{link.Callback.folder_list_page}/{page - 1}'
+            callback_data=link.pack(
+                link.Callback.folder_list_before, folders[0].id
+            )
         )
         pagination += 1
-    if page < pages:
+    if has_next:
         builder.button(
             text=_('➡️ Next page'),
-            callback_data=f'{link.Callback.folder_list_page}/{page + 1}'
+            callback_data=link.pack(
+                link.Callback.folder_list_after, folders[-1].id
+            )
         )
         pagination += 1
 
@@ -99,18 +114,18 @@ def get_list(account: Account,
     return text, builder.as_markup()
 
 
-@router.callback_query(
-    F.data.startswith(link.Callback.folder_list_page)
+@actions.register(
+    link.Callback.folder_list_after, link.Callback.folder_list_before
 )
 async def paginated_listing(
-    callback: types.CallbackQuery, bot: Bot, account: Account
+    callback: types.CallbackQuery,
+    bot: Bot,
+    account: Account,
+    action: link.Action,
+    params: dict
 ):
-    page = callback.data.split('/')[-1]  # type: ignore
-
-    if not page.isdigit():
-        return await callback.answer('Incorrect page')
-
-    text, markup = get_list(account, int(page))
+    backward = action.op == link.Callback.folder_list_before
+    text, markup = await get_list(account, params['id'], backward)
 
     if callback.message:
         chat, message = callback.message.chat.id, callback.message.message_id
@@ -129,13 +144,11 @@ async def paginated_listing(
         )
 
 
-@router.callback_query(
-    F.data == link.Callback.folder_list
-)
+@actions.register(link.Callback.folder_list)
 async def listing_as_callback(
     callback: types.CallbackQuery, bot: Bot, account: Account
 ):
-    text, markup = get_list(account, 1)
+    text, markup = await get_list(account)
 
     if callback.message:
         chat, message = callback.message.chat.id, callback.message.message_id
@@ -159,11 +172,11 @@ async def listing_as_callback(
 async def listing_as_message(
     message: types.Message, bot: Bot, account: Account
 ):
-    text, markup = get_list(account, 1)
+    text, markup = await get_list(account)
     await message.answer(**text.as_kwargs(), reply_markup=markup)
 
 
-@router.callback_query(F.data == link.Callback.folder_create)
+@actions.register(link.Callback.folder_create)
 async def create(callback: types.CallbackQuery,
                  bot: Bot,
                  state: FSMContext,
@@ -199,12 +212,7 @@ async def save(
     data = message.text.split('\n\n', 1)
     name, description = data if len(data) == 2 else (data[0], None)
 
-    with database:
-        Folder.create(
-            name=name,
-            account=account,
-            description=description
-        )
+    await repository.create_folder(account, name, description)
 
     text = _(
         'Folder "%s" has been created. '
@@ -216,18 +224,12 @@ async def save(
     await message.answer(text)
 
 
-@router.callback_query(
-    F.data.startswith(link.Callback.folder_retrieve)
-)
+@actions.register(link.Callback.folder_retrieve)
 async def retrieve(
-    callback: types.CallbackQuery, bot: Bot, account: Account
+    callback: types.CallbackQuery, bot: Bot, account: Account, params: dict
 ):
     does_not_exists = _('Folder does not exists')
-
-    try:
-        id = int(callback.data.split('/')[-1])  # type: ignore
-    except ValueError:
-        return await callback.answer(does_not_exists)
+    id = params['id']
 
     if id == 0:
         folder = Folder(
@@ -240,9 +242,7 @@ async def retrieve(
         )
     else:
         try:
-            with database:
-                filter = Folder.id == id  # type: ignore
-                folder = account.folders.where(filter).get()  # type: ignore
+            folder = await repository.get_folder(account, id)
         except DoesNotExist:
             return await callback.answer(does_not_exists)
 
@@ -250,15 +250,15 @@ async def retrieve(
 
     builder.button(
         text=_('🟢 Set as active'),
-        callback_data=f'{link.Callback.set_active_folder}/{id}'
+        callback_data=link.pack(link.Callback.set_active_folder, id)
     )
     builder.button(
         text=_('🔄 Update details'),
-        callback_data=f'{link.Callback.folder_update}/{id}'
+        callback_data=link.pack(link.Callback.folder_update, id)
     )
     builder.button(
         text=_('❌ Delete'),
-        callback_data=f'{link.Callback.folder_delete}/{id}'
+        callback_data=link.pack(link.Callback.folder_delete, id)
     )
     builder.button(
         text=_('📁 Folders'),
@@ -293,32 +293,17 @@ async def retrieve(
         )
 
 
-@router.callback_query(
-    F.data.startswith(link.Callback.set_active_folder)
-)
+@actions.register(link.Callback.set_active_folder)
 async def activate(
-    callback: types.CallbackQuery, account: Account, bot: Bot
+    callback: types.CallbackQuery, account: Account, bot: Bot, params: dict
 ):
     does_not_exists = _('Folder does not exists')
 
     try:
-        folder_id = int(callback.data.split('/')[-1])  # type: ignore
-    except (ValueError, DoesNotExist):
+        folder = await repository.set_active_folder(account, params['id'])
+    except DoesNotExist:
         return await callback.answer(does_not_exists)
 
-    with database:
-        if folder_id == 0:
-            folder = None
-        else:
-            try:
-                filter = Folder.id == folder_id  # type: ignore
-                folder = account.folders.where(filter).get()  # type: ignore
-            except DoesNotExist:
-                return await callback.answer(does_not_exists)
-
-        account.active_folder = folder  # type: ignore
-        account.save()
-
     name = folder.name if folder else _('Main folder')
     text = _('Active folder successfully changed. Now active folder is "%s"')
     text %= name
@@ -327,19 +312,14 @@ async def activate(
     await bot.send_message(account.id, text)   # type: ignore
 
 
-@router.callback_query(
-    F.data.startswith(link.Callback.folder_update)
-)
+@actions.register(link.Callback.folder_update)
 async def update(callback: types.CallbackQuery,
                  bot: Bot,
                  state: FSMContext,
-                 account: Account):
+                 account: Account,
+                 params: dict):
     does_not_exists = _('Folder does not exists')
-
-    try:
-        folder_id = int(callback.data.split('/')[-1])  # type: ignore
-    except (ValueError, DoesNotExist):
-        return await callback.answer(does_not_exists)
+    folder_id = params['id']
 
     if folder_id == 0:
         return await callback.answer(
@@ -347,9 +327,7 @@ async def update(callback: types.CallbackQuery,
         )
     else:
         try:
-            with database:
-                filter = Folder.id == folder_id  # type: ignore
-                folder = account.folders.where(filter).get()  # type: ignore
+            folder = await repository.get_folder(account, folder_id)
         except DoesNotExist:
             return await callback.answer(does_not_exists)
 
@@ -369,41 +347,34 @@ async def update(callback: types.CallbackQuery,
     )
 
     await state.set_state(UpdateFolder.typing)
-    await state.set_data({
-        'folder_id': folder.id,
-        'chat_id': message.chat.id,
-        'message_id': message.message_id
-    })
+    data = UpdateFolderData(
+        folder_id=folder.id, explanation=MessageRef.of(message)
+    )
+    await state.set_data(data.dump())
 
 
 @router.message(UpdateFolder.typing)
 async def save_update(
     message: types.Message, bot: Bot, state: FSMContext, account: Account
 ):
-    data = await state.get_data()
-    id = data.pop('folder_id', None)
+    data = UpdateFolderData.load(await state.get_data())
 
     if not message.text:
         return await message.reply(
             _("Sorry, but I can't process it. Try again.")
         )
-    if not isinstance(id, int):
+    if data is None:
         return await message.answer('Incorrect id ):')
 
-    with database:
-        try:
-            filter = Folder.id == id  # type: ignore
-            folder = account.folders.where(filter).get()  # type: ignore
-        except DoesNotExist:
-            return await message.answer(_('Folder does not exist'))
-
-        input = message.text.split('\n\n', 1)
-        name, description = input if len(input) == 2 else (input[0], None)
+    input = message.text.split('\n\n', 1)
+    name, description = input if len(input) == 2 else (input[0], None)
 
-        folder.name = name
-        if description:
-            folder.description = description
-        folder.save()
+    try:
+        await repository.update_folder(
+            account, data.folder_id, name, description
+        )
+    except DoesNotExist:
+        return await message.answer(_('Folder does not exist'))
 
     text = _(
         'Folder "%s" successfully changed. '
@@ -411,28 +382,22 @@ async def save_update(
     )
     text = text % (name, link.Cmd.folders.command)
 
-    if 'message_id' in data and 'chat_id' in data:
-        await bot.edit_message_reply_markup(**data)
+    if data.explanation:
+        await bot.edit_message_reply_markup(**data.explanation.as_kwargs())
 
     await state.clear()
     await message.answer(text)
 
 
-@router.callback_query(
-    F.data.startswith(link.Callback.folder_delete)
-)
+@actions.register(link.Callback.folder_delete)
 async def delete(
     callback: types.CallbackQuery,
     bot: Bot,
     account: Account,
-    state: FSMContext
+    state: FSMContext,
+    params: dict
 ):
-    does_not_exists = _('Folder does not exists')
-
-    try:
-        id = int(callback.data.split('/')[-1])  # type: ignore
-    except (ValueError, DoesNotExist):
-        return await callback.answer(does_not_exists)
+    id = params['id']
 
     if id == 0:
         return await callback.answer(
@@ -442,7 +407,7 @@ async def delete(
     builder = keyboard.InlineKeyboardBuilder()
     builder.button(
         text=_('❌ Confirm deletion'),
-        callback_data=f'{link.Callback.folder_perform_delete}/{id}'
+        callback_data=link.pack(link.Callback.folder_perform_delete, id)
     )
     builder.button(
         text=_('⬅️ Cancel'),
@@ -454,11 +419,8 @@ async def delete(
         'If you delete it, all its contents will also be deleted.'
     )
     if callback.message:
-        data = {
-            'chat_id': callback.message.chat.id,
-            'message_id': callback.message.message_id
-        }
-        await state.set_data(data)
+        data = DeleteFolderData(source=MessageRef.of(callback.message))
+        await state.set_data(data.dump())
 
     await callback.answer(text)
     await bot.send_message(
@@ -468,45 +430,32 @@ async def delete(
     )
 
 
-@router.callback_query(
-    F.data.startswith(link.Callback.folder_perform_delete)
-)
+@actions.register(link.Callback.folder_perform_delete)
 async def perform_delete(
     callback: types.CallbackQuery,
     bot: Bot,
     account: Account,
-    state: FSMContext
+    state: FSMContext,
+    params: dict
 ):
     does_not_exists = _('Folder does not exists')
-
-    try:
-        id = int(callback.data.split('/')[-1])  # type: ignore
-    except (ValueError, DoesNotExist):
-        return await callback.answer(does_not_exists)
+    id = params['id']
 
     if id == 0:
         return await callback.answer(
             _('Sorry, but you cannot delete the main folder.')
         )
 
-    with database:
-        try:
-            filter = Folder.id == id  # type: ignore
-            folder = account.folders.where(filter).get()  # type: ignore
-        except DoesNotExist:
-            return await callback.answer(does_not_exists)
-
-        if account.active_folder == folder:
-            account.active_folder = None  # type: ignore
-            account.save()
-
-        folder.delete_instance()
+    try:
+        folder = await repository.delete_folder(account, id)
+    except DoesNotExist:
+        return await callback.answer(does_not_exists)
 
     text = _('Folder "%s" was successfully deleted') % folder.name
-    data = await state.get_data()
+    data = DeleteFolderData.load(await state.get_data())
 
-    if 'chat_id' in data and 'message_id' in data:
-        await bot.edit_message_reply_markup(**data)
+    if data and data.source:
+        await bot.edit_message_reply_markup(**data.source.as_kwargs())
 
     if callback.message:
         await bot.edit_message_text(
@@ -516,9 +465,7 @@ async def perform_delete(
     await callback.answer(text)
 
 
-@router.callback_query(
-    F.data == link.Callback.folder_cancel_delete
-)
+@actions.register(link.Callback.folder_cancel_delete)
 async def cancel_delete(
     callback: types.CallbackQuery, bot: Bot, account: Account
 ):
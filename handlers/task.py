@@ -1,40 +1,39 @@
 import pytz
 import reports
 import reminder
-import tempfile
-from math import ceil
-from typing import Callable
+from functools import partial
+from typing import Awaitable, Callable
 from datetime import datetime
-from peewee import DoesNotExist
 
 import link
+import repository
 from middleware import TaskMiddleware
-from filters import LinkFilter, without_state
-from models import database, Account, Folder, Task, Duration, utc_now
-from state import CreateDuration, CreateTask, UpdateTask, CreateReminder
+from handlers.utils import base_retrieve, edit_callback_message
+from dispatch import ActionTable
+from models import Account, Folder, Task, utc_now
+from state import (
+    CreateTask,
+    UpdateTask,
+    CreateReminder,
+    MessageRef,
+    CreateTaskData,
+    DraftTaskData,
+    UpdateTaskData,
+    CreateReminderData,
+)
 
 from aiogram import Router, Bot, F, types
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.utils import keyboard
 from aiogram.utils.i18n import gettext as _
-from aiogram.utils.formatting import as_numbered_section
-
+from aiogram.utils.formatting import Pre, Text, as_numbered_section
 
-detail_router = Router()
-detail_router.callback_query.middleware(TaskMiddleware())
 
 router = Router()
-router.include_router(detail_router)
-
-
-def is_message(data):
-    if (
-        isinstance(data, dict)
-        and 'message_id' in data
-        and 'chat_id' in data
-    ):
-        return True
+actions = ActionTable()
+# Actions with a task, which is loaded by the middleware
+detail_actions = ActionTable(middlewares=[TaskMiddleware()])
 
 
 def parse(text: str) -> tuple[str, str | None]:
@@ -43,72 +42,59 @@ def parse(text: str) -> tuple[str, str | None]:
     return name, description
 
 
-async def edit_callback_message(
-    callback: types.CallbackQuery,
-    bot: Bot,
-    user_id: int,
-    text: str,
-    markup: types.InlineKeyboardMarkup | None
-):
-    if callback.message:
-        msg: dict = {
-            'chat_id': callback.message.chat.id,
-            'message_id': callback.message.message_id
-        }
-        await bot.edit_message_text(text, **msg, reply_markup=markup)
-    else:
-        await bot.send_message(user_id, text, reply_markup=markup)
-
-
-def create_list(account: Account,
-                page: int) -> tuple[str, types.InlineKeyboardMarkup]:
+async def create_list(
+    account: Account,
+    cursor: tuple[datetime, int] | None = None,
+    backward: bool = False
+) -> tuple[str, types.InlineKeyboardMarkup]:
+    '''
+    Renders the page of tasks following the cursor, or
+    preceding it if backward, or the first page without it
+    '''
     # "id=None" is main folder
     folder = Folder(id=None, name=_('Main folder'), account=account)
     if account.active_folder:
         folder = account.active_folder
 
-    with database:
-        query = (
-            folder.tasks  # type: ignore
-            .where(Task.is_done == False)  # noqa
-            .order_by(Task.created_at.desc())  # type: ignore
-        )
-
-        count = query.count()
-        per_page = 15
-        pages = ceil(count / per_page)
-
-        builder = keyboard.InlineKeyboardBuilder()
+    per_page = 15
+    tasks, more = await repository.list_tasks(
+        account, account.active_folder, per_page, cursor, backward
+    )
 
-        if page > pages:
-            text = _(
-                'There is no incomplete task in the folder "%s". '
-                'Create a new one if necessary.'
-            )
-            text %= folder.name
+    builder = keyboard.InlineKeyboardBuilder()
 
-            builder.button(
-                text=_('🆕 Create task'),
-                callback_data=link.Call.Task.create
-            )
+    if not tasks:
+        text = _(
+            'There is no incomplete task in the folder "%s". '
+            'Create a new one if necessary.'
+        )
+        text %= folder.name
 
-            return text, builder.as_markup()
+        builder.button(
+            text=_('🆕 Create task'),
+            callback_data=link.Call.Task.create
+        )
 
-        tasks = query.paginate(page, per_page)
-        tasks = list(tasks)
+        return text, builder.as_markup()
 
     for number, task in enumerate(tasks, 1):
-        data = link.build(link.Call.Task.retrieve, id=task.id)
+        data = link.pack(link.Call.Task.retrieve, task.id)
         builder.button(text=str(number), callback_data=data)
 
     pagination = 0
+    has_previous = more if backward else cursor is not None
+    has_next = cursor is not None if backward else more
 
-    if page > 1:
-        data = link.build(link.Call.Task.list, page=page-1)
+    if has_previous:
+        first = tasks[0]
+        data = link.pack(
+            link.Call.Task.list_before, first.created_at, first.id
+        )
         builder.button(text=_('⬅️ Previous page'), callback_data=data)
         pagination += 1
-    if page < pages:
-        data = link.build(link.Call.Task.list, page=page+1)
+    if has_next:
+        last = tasks[-1]
+        data = link.pack(link.Call.Task.list_after, last.created_at, last.id)
         builder.button(text=_('➡️ Next page'), callback_data=data)
         pagination += 1
 
@@ -151,31 +137,33 @@ def create_list(account: Account,
     F.text == link.Text.list
 )
 async def listing_on_message(message: types.Message, account: Account):
-    text, markup = create_list(account, 1)
+    text, markup = await create_list(account)
     await message.answer(text, reply_markup=markup)
 
 
-@router.callback_query(
-    LinkFilter(link.Call.Task.list)
+@actions.register(
+    link.Call.Task.list, link.Call.Task.list_after, link.Call.Task.list_before
 )
 async def listing_on_callback(
-    callback: types.CallbackQuery, bot: Bot, account: Account, params: dict
+    callback: types.CallbackQuery,
+    bot: Bot,
+    account: Account,
+    action: link.Action
 ):
-    page = params.get('page', 1)
+    cursor, backward = None, False
 
-    if not isinstance(page, int) or page < 1:
-        return await callback.answer(
-            _("Sorry, but I can't process it because the page is wrong. ):")
-        )
+    if action.op != link.Call.Task.list:
+        cursor = action.params['at'], action.params['id']
+        backward = action.op == link.Call.Task.list_before
 
-    text, markup = create_list(account, page)
+    text, markup = await create_list(account, cursor, backward)
     await edit_callback_message(
         callback, bot, account.id, text, markup  # type: ignore
     )
 
 
 @router.message(F.text == link.Text.create)
-@router.callback_query(F.data == link.Call.Task.create)
+@actions.register(link.Call.Task.create)
 @router.message(
     Command(link.Cmd.create)
 )
@@ -198,13 +186,9 @@ async def start_create(event: types.Message | types.CallbackQuery,
         await event.answer(text)
         explanation = await bot.send_message(account.id,  # type: ignore
                                              text, reply_markup=markup)
-    data = {}
-    data['explanation'] = {
-        'chat_id': explanation.chat.id,
-        'message_id': explanation.message_id
-    }
+    data = CreateTaskData(explanation=MessageRef.of(explanation))
 
-    await state.set_data(data)
+    await state.set_data(data.dump())
     await state.set_state(CreateTask.typing)
 
 
@@ -218,62 +202,45 @@ async def end_create(message: types.Message,
         await message.reply(_("Sorry, but I can't process it. Try again."))
         return await start_create(message, bot, account, state)
 
-    with database:
-        name, description = parse(message.text)
-        folder = Folder(id=None, name=_('Main folder'), account=account)
+    name, description = parse(message.text)
+    folder = Folder(id=None, name=_('Main folder'), account=account)
 
-        if account.active_folder:
-            folder = account.active_folder
+    if account.active_folder:
+        folder = account.active_folder
 
-        task = Task.create(
-            account=account,
-            folder=folder,
-            name=name,
-            description=description,
-        )
+    task = await repository.create_task(account, folder, name, description)
 
     text, markup = base_retrieve(task)
 
     await message.answer(_('Task "%s" successfully created.') % name)
     await message.answer(text, reply_markup=markup)
 
-    data = await state.get_data()
-    explanation = data.get('explanation')
+    data = CreateTaskData.load(await state.get_data())
 
-    if is_message(explanation):
-        await bot.edit_message_reply_markup(**explanation)  # type: ignore
+    if data and data.explanation:
+        await bot.edit_message_reply_markup(**data.explanation.as_kwargs())
 
     await state.clear()
 
 
-@router.callback_query(
-    F.data == link.Call.Task._end_create
-)
+@actions.register(link.Call.Task._end_create)
 async def _end_create(
     callback: types.CallbackQuery,
     bot: Bot,
     state: FSMContext,
     account: Account
 ):
-    data = await state.get_data()
+    data = DraftTaskData.load(await state.get_data())
 
-    try:
-        name = data['name']
-        description = data['description']
-    except KeyError:
+    if data is None:
         return
+    name, description = data.name, data.description
 
-    with database:
-        folder = Folder(id=None, name=_('Main folder'), account=account)
-        if account.active_folder:
-            folder = account.active_folder
+    folder = Folder(id=None, name=_('Main folder'), account=account)
+    if account.active_folder:
+        folder = account.active_folder
 
-        task = Task.create(
-            account=account,
-            folder=folder,
-            name=name,
-            description=description,
-        )
+    task = await repository.create_task(account, folder, name, description)
 
     text, markup = base_retrieve(task)
 
@@ -286,65 +253,7 @@ async def _end_create(
     await callback.answer(_('Task "%s" successfully created.') % name)
 
 
-def base_retrieve(task: Task) -> tuple[str, types.InlineKeyboardMarkup]:
-
-    created_at = task.localized_created_at.strftime('%d.%m.%Y, %H:%M')
-    folder = Folder(name=_('Main folder'))
-
-    if task.folder:
-        folder = task.folder
-
-    fields = [
-        _('Your task from the folder "%s"') % folder.name,
-        _('Name: %s') % task.name,
-        _('Created by: %s') % created_at,
-    ]
-    if task.description:
-        fields.insert(2, _('Description: %s') % task.description)
-
-    id = task.id
-    builder = keyboard.InlineKeyboardBuilder()
-
-    builder.button(
-        text=_('✅ Mark done'),
-        callback_data=link.build(link.Call.Task.mark_done, id=id)
-    )
-    builder.button(
-        text=_('🔄 Update'),
-        callback_data=link.build(link.Call.Task.update, id=id)
-    )
-    builder.button(
-        text=_('📁 Active folder'),
-        callback_data=link.Call.Task.list
-    )
-    builder.button(
-        text=_('❌ Remove'),
-        callback_data=link.build(link.Call.Task.remove, id=id)
-    )
-    builder.button(
-        text=_('⏲️ Countdown'),
-        callback_data=link.build(link.Call.Task.start_countdown, id=id)
-    )
-    builder.button(
-        text=_('🔔 Reminder'),
-        callback_data=link.build(link.Call.Task.start_reminder, id=id)
-    )
-    if task.durations.count():  # type: ignore
-        builder.button(
-            text=_('🕰️📈 Reports'),
-            callback_data=link.build(link.Call.Task.task_reports, id=id)
-        )
-    builder.adjust(2, 2, 2, 1)
-
-    text = '\n\n'.join(fields)
-    markup = builder.as_markup()
-
-    return text, markup
-
-
-@detail_router.callback_query(
-    LinkFilter(link.Call.Task.retrieve)
-)
+@detail_actions.register(link.Call.Task.retrieve)
 async def retrieve(
     callback: types.CallbackQuery,
     task: Task,
@@ -357,14 +266,11 @@ async def retrieve(
     )
 
 
-@detail_router.callback_query(
-    LinkFilter(link.Call.Task.mark_done)
-)
+@detail_actions.register(link.Call.Task.mark_done)
 async def mark_done(
     callback: types.CallbackQuery, task: Task, bot: Bot,
 ):
-    task.is_done = True  # type: ignore
-    task.save()
+    await repository.mark_done(task)
 
     text = _('The task "%s" has been successfully marked as completed.')
     await callback.answer(text % task.name)
@@ -383,9 +289,7 @@ async def mark_done(
         )
 
 
-@detail_router.callback_query(
-    LinkFilter(link.Call.Task.update)
-)
+@detail_actions.register(link.Call.Task.update)
 async def start_update(
     callback: types.CallbackQuery,
     task: Task,
@@ -407,21 +311,12 @@ async def start_update(
         event_from_user.id, text, reply_markup=builder.as_markup()
     )
 
-    data = {
-        'task_id': task.id,
-        'explanation': {
-            'chat_id': message.chat.id,
-            'message_id': message.message_id,
-        }
-    }
+    data = UpdateTaskData(task_id=task.id, explanation=MessageRef.of(message))
     if callback.message:
-        data['source'] = {
-            'chat_id': callback.message.chat.id,
-            'message_id': callback.message.message_id,
-        }
+        data.source = MessageRef.of(callback.message)
 
     await state.set_state(UpdateTask.typing)
-    await state.set_data(data)
+    await state.set_data(data.dump())
 
 
 @router.message(UpdateTask.typing)
@@ -436,44 +331,33 @@ async def end_update(
             _("Sorry, but I can't process it. Try again.")
         )
 
-    data = await state.get_data()
-    id = data.pop('task_id', None)
+    data = UpdateTaskData.load(await state.get_data())
     does_not_exist = _('Update task does not exist ):')
 
-    if not isinstance(id, int):
+    if data is None:
         return message.reply(does_not_exist)
 
-    with database:
-        try:
-            task = Task \
-                .select().where(Task.id == id, Task.account == account).get()
-        except DoesNotExist:
-            return message.reply(does_not_exist)
-
-        name, description = parse(message.text)
+    name, description = parse(message.text)
+    task = await repository.update_task(
+        account, data.task_id, name, description
+    )
 
-        task.name = name
-        if description:
-            task.description = description
-        task.save()
+    if task is None:
+        return message.reply(does_not_exist)
 
-    explanation = data.get('explanation')
-    if is_message(explanation):
-        await bot.edit_message_reply_markup(**explanation)  # type: ignore
+    if data.explanation:
+        await bot.edit_message_reply_markup(**data.explanation.as_kwargs())
 
-    source = data.get('source')
-    if is_message(source):
+    if data.source:
         text, markup = base_retrieve(task)
         await bot.edit_message_text(text, reply_markup=markup,
-                                    **source)  # type: ignore
+                                    **data.source.as_kwargs())
 
     await state.clear()
     await message.answer(_('Task "%s" successfully updated.') % name)
 
 
-@detail_router.callback_query(
-    LinkFilter(link.Call.Task.remove)
-)
+@detail_actions.register(link.Call.Task.remove)
 async def start_remove(
     callback: types.CallbackQuery,
     task: Task,
@@ -485,7 +369,7 @@ async def start_remove(
     builder = keyboard.InlineKeyboardBuilder()
     builder.button(
         text=_('❌ Confirm deletion'),
-        callback_data=link.build(link.Call.Task.confirm_remove, id=task.id)
+        callback_data=link.pack(link.Call.Task.confirm_remove, task.id)
     )
     builder.button(text=_('⬅️ Cancel'), callback_data=link.Call.cancel)
 
@@ -496,9 +380,7 @@ async def start_remove(
     await edit_callback_message(callback, bot, chat_id, text, markup)
 
 
-@detail_router.callback_query(
-    LinkFilter(link.Call.Task.confirm_remove)
-)
+@detail_actions.register(link.Call.Task.confirm_remove)
 async def end_remove(
     callback: types.CallbackQuery,
     task: Task,
@@ -508,187 +390,13 @@ async def end_remove(
     chat_id = event_from_user.id
     text = _('Task "%s" successfully deleted!') % task.name
 
-    task.delete_instance()
+    await repository.delete_task(task)
 
     await callback.answer(text)
     await edit_callback_message(callback, bot, chat_id, text, None)
 
 
-@detail_router.callback_query(
-    LinkFilter(link.Call.Task.start_countdown)
-)
-async def start_countdown(
-    callback: types.CallbackQuery,
-    bot: Bot,
-    event_from_user: types.User,
-    task: Task
-):
-    started_at = utc_now()
-    builder = keyboard.InlineKeyboardBuilder()
-    complete_link = link.build(
-        link.Call.Task.complete_countdown,
-        id=task.id,
-        start=started_at.strftime(Duration.transition_date_format),
-    )
-
-    builder.button(
-        text=_('⏰ Complete the countdown'),
-        callback_data=complete_link
-    )
-    builder.button(
-        text=_('❌ Cancel'),
-        callback_data=link.Call.cancel
-    )
-
-    text = _(
-        'The countdown for the task "%s" has started (%s). '
-        'To complete it, please press the corresponding '
-        '"⏰ Complete the countdown" button.'
-    )
-    text %= task.name, started_at.strftime('%d.%m.%Y, %H:%M')
-
-    await callback.answer('OK')
-    await bot.send_message(
-        event_from_user.id,
-        text,
-        reply_markup=builder.as_markup()
-    )
-
-
-@detail_router.callback_query(
-    LinkFilter(link.Call.Task.complete_countdown)
-)
-async def complete_countdown(
-    callback: types.CallbackQuery,
-    bot: Bot,
-    state: FSMContext,
-    event_from_user: types.User,
-    task: Task,
-    params: dict,
-):
-    message: dict | None = None
-    end = utc_now()
-
-    try:
-        start = datetime.strptime(
-            params['start'], Duration.transition_date_format
-        )
-    except Exception:
-        start = None
-
-    if callback.message:
-        message = {
-            'chat_id': callback.message.chat.id,
-            'message_id': callback.message.message_id,
-        }
-        await bot.edit_message_reply_markup(**message)
-
-    if not isinstance(start, datetime) or start > end:
-        return await callback.answer(_('Button with incorrect data :('))
-
-    builder = keyboard.InlineKeyboardBuilder()
-    builder.button(text=_('✅YES'), callback_data=link.Call.Task.save_duration)
-    builder.button(text=_('❌ REMOVE'), callback_data=link.Call.cancel)
-
-    markup = builder.as_markup()
-    text = _(
-        'Would you like to record the execution time '
-        '(start: %s, duration: %s) for the task "%s"?\n\n'
-        'If yes, please click the corresponding button '
-        'or send any message with the text – it will be '
-        'automatically added as a note to this record.\n\n'
-        'If not, simply click the corresponding button.'
-    )
-    text %= start.strftime('%M, %d, %H:%M:%S'), (end - start), task.name
-
-    if message:
-        explanation = await bot.edit_message_text(
-            text, **message, reply_markup=markup
-        )
-    else:
-        explanation = await bot.send_message(
-            event_from_user.id, text, reply_markup=markup
-        )
-
-    data = {'task': task, 'start': start, 'end': end}
-    if isinstance(explanation, types.Message):
-        data['explanation'] = explanation.chat.id, explanation.message_id
-
-    await state.set_data(data)
-    await state.set_state(CreateDuration.typing)
-
-
-@router.callback_query(
-    F.data == link.Call.Task.save_duration, without_state
-)
-async def stateless_save_duration(callback: types.CallbackQuery, bot: Bot):
-    msg = callback.message
-    if msg:
-        await bot.edit_message_reply_markup(msg.chat.id, msg.message_id)
-
-    await callback.answer(
-        _('Sorry, something unexpected happened. I can\'t process it.')
-    )
-
-
-@router.message(
-    CreateDuration.typing
-)
-@router.callback_query(
-    CreateDuration.typing, F.data == link.Call.Task.save_duration
-)
-async def save_duration(
-    update: types.Message | types.CallbackQuery,
-    bot: Bot,
-    state: FSMContext,
-    event_from_user: types.User
-):
-    data = await state.get_data()
-    explanation = data.pop('explanation', None)
-    is_callback = isinstance(update, types.CallbackQuery)
-    notes = None
-
-    try:
-        task: Task = data.pop('task')
-    except KeyError:
-        return await update.answer(
-            _('Sorry, something unexpected happened. I can\'t process it.')
-        )
-
-    if isinstance(update, types.Message):
-        if not update.text:
-            return await update.answer(
-                _('Sorry, but I can\'t process it. Try again.')
-            )
-        notes = update.text
-
-    if isinstance(explanation, tuple):
-        await bot.edit_message_reply_markup(*explanation)
-
-    try:
-        with database:
-            Duration.create(validate=True, task=task, notes=notes, **data)
-    except ValueError as e:
-        text = str(e)
-
-        if is_callback:
-            await bot.send_message(event_from_user.id, text)
-        return await update.answer(text)
-
-    text = _(
-        'The time record for the task "%s" has been successfully created.'
-    ) % task.name
-
-    await state.clear()
-    await update.answer(text)
-
-    if is_callback:
-        await bot.send_message(event_from_user.id, text)
-
-
-@detail_router.callback_query(
-    LinkFilter(link.Call.Task.task_reports)
-)
+@detail_actions.register(link.Call.Task.task_reports)
 async def task_reports(
     callback: types.CallbackQuery,
     bot: Bot,
@@ -709,7 +417,7 @@ async def task_reports(
     builder = keyboard.InlineKeyboardBuilder()
     for content, base in buttons:
         builder.button(
-            text=content, callback_data=link.build(base, id=task.id)
+            text=content, callback_data=link.pack(base, task.id)
         )
 
     builder.adjust(2, 2, 1)
@@ -724,102 +432,122 @@ async def task_reports(
     await callback.answer(text)
 
 
-@detail_router.callback_query(
-        LinkFilter(link.Call.Task.task_day_report)
-)
-async def task_day_report(
+async def send_report(
     callback: types.CallbackQuery,
     bot: Bot,
-    event_from_user: types.User,
-    task: Task
+    chat_id: int,
+    key: str,
+    report: Callable[[], Awaitable[bytes]],
+    caption: str
 ):
-    with tempfile.NamedTemporaryFile(suffix='.png') as file:
+    '''
+    Sends the cached image of the report, or awaits the image rendered
+    by the report pool and caches it, or explains why it is missing.
+    With the text backend the report is sent in a message after the
+    caption instead.
+    '''
+    entry = await reports.cache.cache.get(key)
+
+    if entry is not None and entry.file_id:
+        await callback.answer('OK')
+        return await bot.send_photo(chat_id, entry.file_id, caption=caption)
+
+    if entry is None:
         try:
-            reports.task.today(task, file)
+            entry = reports.cache.Entry(await report())
         except ValueError:
             text = _(
                 'Sorry, but there is not enough data to generate the '
                 'report. Please use the countdown and try again later.'
             )
             await callback.answer(text)
-            return await bot.send_message(event_from_user.id, text)
+            return await bot.send_message(chat_id, text)
+        except reports.pool.Overloaded:
+            return await callback.answer(
+                _('Sorry, but too many reports are being generated '
+                  'right now. Please try again in a minute.')
+            )
 
-        text = _(
-            'The sent photo contains today\'s '
-            'activity report for the task "%s".'
-        ) % task.name
+        await reports.cache.cache.set(key, entry)
 
-        await callback.answer('OK')
-        await bot.send_photo(
-            event_from_user.id, types.FSInputFile(file.name), caption=text
+    await callback.answer('OK')
+
+    if reports.backend.name == reports.backend.TEXT:
+        separator = '\n\n'
+        limit = reports.text.MAX_LENGTH - reports.text.length(
+            caption + separator
         )
+        text = reports.text.fit(entry.image.decode(), limit)
+        content = Text(caption, separator, Pre(text))
+        return await bot.send_message(chat_id, **content.as_kwargs())
+
+    message = await bot.send_photo(
+        chat_id,
+        types.BufferedInputFile(entry.image, filename='report.png'),
+        caption=caption
+    )
 
+    if message.photo:
+        file_id = message.photo[-1].file_id
+        await reports.cache.cache.set(key, entry._replace(file_id=file_id))
 
-@detail_router.callback_query(
-        LinkFilter(link.Call.Task.task_week_report)
-)
-async def task_week_report(
+
+async def task_report(
     callback: types.CallbackQuery,
     bot: Bot,
-    event_from_user: types.User,
-    task: Task
+    task: Task,
+    count: int,
+    report: Callable[[Task], Awaitable[bytes]],
+    caption: str
 ):
-    with tempfile.NamedTemporaryFile(suffix='.png') as file:
-        try:
-            reports.task.week(task, file)
-        except ValueError:
-            text = _(
-                'Sorry, but there is not enough data to generate the '
-                'report. Please use the countdown and try again later.'
-            )
-            await callback.answer(text)
-            return await bot.send_message(event_from_user.id, text)
+    version = await repository.report_version(task.account_id)  # type: ignore
+    key = reports.cache.key(
+        f'task:{task.id}', count, task.account.timezone, version
+    )
 
-        text = _(
-            'The sent photo contains the activity report '
-            'for the task "%s" for the last 7 days.'
-        ) % task.name
+    await send_report(
+        callback, bot, task.account_id, key,  # type: ignore
+        partial(report, task), caption
+    )
 
-        await callback.answer('OK')
-        await bot.send_photo(
-            event_from_user.id, types.FSInputFile(file.name), caption=text
-        )
 
+@detail_actions.register(link.Call.Task.task_day_report)
+async def task_day_report(
+    callback: types.CallbackQuery, bot: Bot, task: Task
+):
+    text = _(
+        'The sent photo contains today\'s '
+        'activity report for the task "%s".'
+    ) % task.name
+
+    await task_report(callback, bot, task, 0, reports.task.today, text)
 
-@detail_router.callback_query(
-        LinkFilter(link.Call.Task.task_month_report)
-)
-async def task_month_report(
-    callback: types.CallbackQuery,
-    bot: Bot,
-    event_from_user: types.User,
-    task: Task
+
+@detail_actions.register(link.Call.Task.task_week_report)
+async def task_week_report(
+    callback: types.CallbackQuery, bot: Bot, task: Task
 ):
-    with tempfile.NamedTemporaryFile(suffix='.png') as file:
-        try:
-            reports.task.month(task, file)
-        except ValueError:
-            text = _(
-                'Sorry, but there is not enough data to generate the '
-                'report. Please use the countdown and try again later.'
-            )
-            await callback.answer(text)
-            return await bot.send_message(event_from_user.id, text)
+    text = _(
+        'The sent photo contains the activity report '
+        'for the task "%s" for the last 7 days.'
+    ) % task.name
 
-        text = _(
-            'The sent photo contains the activity report '
-            'for the task "%s" for the last 30 days.'
-        ) % task.name
+    await task_report(callback, bot, task, 6, reports.task.week, text)
 
-        await callback.answer('OK')
-        await bot.send_photo(
-            event_from_user.id, types.FSInputFile(file.name), caption=text
-        )
 
+@detail_actions.register(link.Call.Task.task_month_report)
+async def task_month_report(
+    callback: types.CallbackQuery, bot: Bot, task: Task
+):
+    text = _(
+        'The sent photo contains the activity report '
+        'for the task "%s" for the last 30 days.'
+    ) % task.name
 
-@detail_router.callback_query(
-    LinkFilter(link.Call.Task.back)
-)
+    await task_report(callback, bot, task, 29, reports.task.month, text)
+
+
+@detail_actions.register(link.Call.Task.back)
 async def back(
     callback: types.CallbackQuery,
     bot: Bot,
@@ -835,9 +563,7 @@ async def back(
         await bot.send_message(event_from_user.id, text, reply_markup=markup)
 
 
-@router.callback_query(
-    F.data == link.Call.Task.folder_reports
-)
+@actions.register(link.Call.Task.folder_reports)
 async def folder_reports(
     callback: types.CallbackQuery,
     bot: Bot,
@@ -854,6 +580,8 @@ async def folder_reports(
         ('1️⃣ Today', link.Call.Task.folder_day_report),
         ('7️⃣ Last 7 days', link.Call.Task.folder_week_report),
         ('3️⃣0️⃣ Last 30 days', link.Call.Task.folder_month_report),
+        ('🗂 All folders, 7 days', link.Call.Task.account_week_report),
+        ('🗂 All folders, 30 days', link.Call.Task.account_month_report),
         ('⬅️ Back', link.Call.Task.folder_back)
     )
 
@@ -861,7 +589,7 @@ async def folder_reports(
     for content, callback_data in buttons:
         builder.button(text=content, callback_data=callback_data)
 
-    builder.adjust(2, 2, 1)
+    builder.adjust(2, 1, 2, 1)
     markup = builder.as_markup()
 
     if callback.message:
@@ -873,11 +601,11 @@ async def folder_reports(
     await callback.answer(text)
 
 
-@router.callback_query(F.data == link.Call.Task.folder_back)
+@actions.register(link.Call.Task.folder_back)
 async def folder_back(
     callback: types.CallbackQuery, bot: Bot, account: Account
 ):
-    text, markup = create_list(account, 1)
+    text, markup = await create_list(account)
     message = callback.message
 
     if message:
@@ -893,75 +621,58 @@ async def base_folder_report(
     callback: types.CallbackQuery,
     bot: Bot,
     account: Account,
-    function: Callable
+    count: int,
+    function: Callable[[Account, Folder | None], Awaitable[bytes]]
 ):
     folder = account.active_folder
+    version = await repository.report_version(account.id)
+    subject = f'folder:{account.id}:{folder.id if folder else 0}'
+    key = reports.cache.key(subject, count, account.timezone, version)
 
-    with tempfile.NamedTemporaryFile(suffix='.png') as file:
-        try:
-            function(account, folder, file)
-        except ValueError:
-            text = _(
-                'Sorry, but there is not enough data to generate the '
-                'report. Please use the countdown and try again later.'
-            )
-            await callback.answer(text)
-            return await bot.send_message(account.id, text)
-
-        text = _(
-            'The attached photo contains an '
-            'activity report for tasks in the "%s" folder'
-        )
-        text %= folder.name if folder else _('Main folder')
+    text = _(
+        'The attached photo contains an '
+        'activity report for tasks in the "%s" folder'
+    )
+    text %= folder.name if folder else _('Main folder')
 
-        await callback.answer('OK')
-        await bot.send_photo(
-            account.id, types.FSInputFile(file.name), caption=text
-        )
+    report = partial(function, account, folder)
+    await send_report(callback, bot, account.id, key, report, text)
 
 
-@router.callback_query(
-    F.data == link.Call.Task.folder_day_report
-)
+@actions.register(link.Call.Task.folder_day_report)
 async def folder_day_report(
     callback: types.CallbackQuery,
     bot: Bot,
     account: Account
 ):
     return await base_folder_report(
-        callback, bot, account, reports.folder.today
+        callback, bot, account, 0, reports.folder.today
     )
 
 
-@router.callback_query(
-    F.data == link.Call.Task.folder_week_report
-)
+@actions.register(link.Call.Task.folder_week_report)
 async def folder_week_report(
     callback: types.CallbackQuery,
     bot: Bot,
     account: Account
 ):
     return await base_folder_report(
-        callback, bot, account, reports.folder.week
+        callback, bot, account, 6, reports.folder.week
     )
 
 
-@router.callback_query(
-    F.data == link.Call.Task.folder_month_report
-)
+@actions.register(link.Call.Task.folder_month_report)
 async def folder_month_report(
     callback: types.CallbackQuery,
     bot: Bot,
     account: Account
 ):
     return await base_folder_report(
-        callback, bot, account, reports.folder.month
+        callback, bot, account, 29, reports.folder.month
     )
 
 
-@detail_router.callback_query(
-    LinkFilter(link.Call.Task.start_reminder)
-)
+@detail_actions.register(link.Call.Task.start_reminder)
 async def start_reminder(
     callback: types.CallbackQuery,
     bot: Bot,
@@ -994,7 +705,7 @@ async def start_reminder(
     text = '\n\n'.join(sections)
 
     await state.set_state(CreateReminder.typing)
-    await state.set_data({'task': task})
+    await state.set_data(CreateReminderData(task_id=task.id).dump())
 
     await bot.send_message(event_from_user.id, text, reply_markup=markup)
     await callback.answer(head)
@@ -1009,8 +720,7 @@ async def end_reminder(
     if not message.text:
         return await message.reply(process_erorr)
 
-    data = await state.get_data()
-    task = data.get('task')
+    data = CreateReminderData.load(await state.get_data())
 
     try:
         date = datetime.strptime(message.text, '%Y-%m-%d %H:%M')
@@ -1025,11 +735,53 @@ async def end_reminder(
     if date < utc_now():
         return await message.reply(_('The entered time is not valid'))
 
-    if not isinstance(task, Task):
+    if data is None:
         await state.clear()
         return await message.answer(
             _('Sorry, but something went wrong. Please try again.')
         )
 
-    reminder.run.apply_async(args=(account.id, task.id), eta=date)
+    reminder.run.apply_async(args=(account.id, data.task_id), eta=date)
     await message.answer(_('Reminder successfully created'))
+
+
+async def base_account_report(
+    callback: types.CallbackQuery,
+    bot: Bot,
+    account: Account,
+    count: int,
+    function: Callable[[Account], Awaitable[bytes]]
+):
+    version = await repository.report_version(account.id)
+    subject = f'account:{account.id}'
+    key = reports.cache.key(subject, count, account.timezone, version)
+
+    text = _(
+        'The attached photo contains an activity '
+        'report for the tasks of all folders'
+    )
+
+    report = partial(function, account)
+    await send_report(callback, bot, account.id, key, report, text)
+
+
+@actions.register(link.Call.Task.account_week_report)
+async def account_week_report(
+    callback: types.CallbackQuery,
+    bot: Bot,
+    account: Account
+):
+    return await base_account_report(
+        callback, bot, account, 6, reports.account.week
+    )
+
+
+@actions.register(link.Call.Task.account_month_report)
+async def account_month_report(
+    callback: types.CallbackQuery,
+    bot: Bot,
+    account: Account
+):
+    return await base_account_report(
+        callback, bot, account, 29, reports.account.month
+    )
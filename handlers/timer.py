@@ -0,0 +1,284 @@
+import link
+import repository
+from datetime import timedelta
+from models import Account, Task, Timer
+from middleware import TaskMiddleware
+from dispatch import ActionTable
+from handlers.utils import edit_callback_message
+from state import DurationNotes, DurationNotesData, MessageRef
+
+from aiogram import Router, Bot, types
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.utils import keyboard
+from aiogram.utils.i18n import gettext as _
+from aiogram.utils.formatting import as_numbered_section
+
+
+router = Router()
+actions = ActionTable()
+# Actions with the task of the timer, which is loaded by the middleware
+detail_actions = ActionTable(middlewares=[TaskMiddleware()])
+
+
+def format_total(total: timedelta) -> str:
+    return str(timedelta(seconds=int(total.total_seconds())))
+
+
+def render(timer: Timer, task: Task) -> tuple[str, types.InlineKeyboardMarkup]:
+    total = format_total(timer.total(repository.now()))
+
+    if timer.is_running:
+        text = _('The timer of the task "%s" is running: %s.')
+    else:
+        text = _('The timer of the task "%s" is paused: %s.')
+    text %= task.name, total
+
+    builder = keyboard.InlineKeyboardBuilder()
+
+    if timer.is_running:
+        builder.button(
+            text=_('⏸️ Pause'),
+            callback_data=link.pack(link.Call.Timer.pause, task.id)
+        )
+    else:
+        builder.button(
+            text=_('▶️ Resume'),
+            callback_data=link.pack(link.Call.Timer.resume, task.id)
+        )
+    builder.button(
+        text=_('⏹️ Stop'),
+        callback_data=link.pack(link.Call.Timer.stop, task.id)
+    )
+    builder.button(
+        text=_('🔄 Refresh'),
+        callback_data=link.pack(link.Call.Timer.retrieve, task.id)
+    )
+    builder.button(
+        text=_('❌ Discard'),
+        callback_data=link.pack(link.Call.Timer.discard, task.id)
+    )
+    builder.button(text=_('⏲️ Timers'), callback_data=link.Call.Timer.list)
+    builder.adjust(2, 2, 1)
+
+    return text, builder.as_markup()
+
+
+async def create_list(
+    account: Account
+) -> tuple[str, types.InlineKeyboardMarkup]:
+    '''
+    Renders the status of the running and paused timers of the account
+    '''
+    timers = await repository.list_timers(account)
+    builder = keyboard.InlineKeyboardBuilder()
+
+    if not timers:
+        text = _(
+            "You don't have any timers. To start one, open a "
+            'task and press the "⏲️ Countdown" button.'
+        )
+        return text, builder.as_markup()
+
+    now = repository.now()
+    lines = []
+
+    for number, timer in enumerate(timers, 1):
+        status = '▶️' if timer.is_running else '⏸️'
+        total = format_total(timer.total(now))
+        lines.append(f'{status} {timer.task.name} – {total}')
+
+        builder.button(
+            text=str(number),
+            callback_data=link.pack(link.Call.Timer.retrieve, timer.task.id)
+        )
+
+    builder.button(text=_('🔄 Refresh'), callback_data=link.Call.Timer.list)
+
+    length = len(timers)
+    sheet = (length // 5) * [5]
+    if length % 5:
+        sheet.append(length % 5)
+    sheet.append(1)
+    builder.adjust(*sheet)
+
+    title = _(
+        'Below are your timers. To pause, resume or stop '
+        'a timer, click on the corresponding number.\n'
+    )
+    text, entities = as_numbered_section(title, *lines).render()
+
+    return text, builder.as_markup()
+
+
+@router.message(
+    Command(link.Cmd.timers)
+)
+async def listing_on_message(message: types.Message, account: Account):
+    text, markup = await create_list(account)
+    await message.answer(text, reply_markup=markup)
+
+
+@actions.register(link.Call.Timer.list)
+async def listing_on_callback(
+    callback: types.CallbackQuery, bot: Bot, account: Account
+):
+    text, markup = await create_list(account)
+    await edit_callback_message(
+        callback, bot, account.id, text, markup  # type: ignore
+    )
+    await callback.answer()
+
+
+@detail_actions.register(link.Call.Task.start_countdown)
+async def start(
+    callback: types.CallbackQuery,
+    bot: Bot,
+    event_from_user: types.User,
+    task: Task
+):
+    try:
+        timer, started = await repository.start_timer(task)
+    except ValueError as e:
+        await callback.answer(str(e))
+        return await bot.send_message(event_from_user.id, str(e))
+
+    text, markup = render(timer, task)
+
+    if started:
+        await callback.answer(_('The timer has been started.'))
+    else:
+        await callback.answer(_('The task already has a timer.'))
+
+    await bot.send_message(event_from_user.id, text, reply_markup=markup)
+
+
+@detail_actions.register(
+    link.Call.Timer.retrieve, link.Call.Timer.pause, link.Call.Timer.resume
+)
+async def change(
+    callback: types.CallbackQuery,
+    bot: Bot,
+    event_from_user: types.User,
+    task: Task,
+    action: link.Action
+):
+    try:
+        if action.op == link.Call.Timer.pause:
+            timer = await repository.pause_timer(task)
+        elif action.op == link.Call.Timer.resume:
+            timer = await repository.resume_timer(task)
+        else:
+            timer = await repository.get_timer(task)
+    except ValueError as e:
+        await callback.answer(str(e))
+        return await bot.send_message(event_from_user.id, str(e))
+
+    if timer is None:
+        return await callback.answer(_('The timer has already been stopped.'))
+
+    text, markup = render(timer, task)
+    await edit_callback_message(
+        callback, bot, event_from_user.id, text, markup
+    )
+    await callback.answer()
+
+
+@detail_actions.register(link.Call.Timer.stop)
+async def stop(
+    callback: types.CallbackQuery,
+    bot: Bot,
+    state: FSMContext,
+    event_from_user: types.User,
+    task: Task
+):
+    try:
+        result = await repository.stop_timer(task)
+    except ValueError as e:
+        await callback.answer(str(e))
+        return await bot.send_message(event_from_user.id, str(e))
+
+    if result is None:
+        return await callback.answer(_('The timer has already been stopped.'))
+
+    timer, duration = result
+    text = _(
+        'The timer of the task "%s" has been stopped, '
+        'the counted time is %s.'
+    )
+    text %= task.name, format_total(timer.total(repository.now()))
+
+    await callback.answer(text)
+    await edit_callback_message(
+        callback, bot, event_from_user.id, text, None
+    )
+
+    if duration is None:
+        return
+
+    builder = keyboard.InlineKeyboardBuilder()
+    builder.button(text=_('⬅️ Skip'), callback_data=link.Call.cancel)
+
+    explanation = await bot.send_message(
+        event_from_user.id,
+        _(
+            'If necessary, send me any message with the text – it will '
+            'be added as a note to the last time record of the timer.'
+        ),
+        reply_markup=builder.as_markup()
+    )
+    data = DurationNotesData(
+        duration_id=duration.id, explanation=MessageRef.of(explanation)
+    )
+
+    await state.set_data(data.dump())
+    await state.set_state(DurationNotes.typing)
+
+
+@detail_actions.register(link.Call.Timer.discard)
+async def discard(
+    callback: types.CallbackQuery,
+    bot: Bot,
+    event_from_user: types.User,
+    task: Task
+):
+    if not await repository.discard_timer(task):
+        return await callback.answer(_('The timer has already been stopped.'))
+
+    text = _(
+        'The timer of the task "%s" has been discarded, '
+        'its running time has not been recorded.'
+    ) % task.name
+
+    await callback.answer(text)
+    await edit_callback_message(
+        callback, bot, event_from_user.id, text, None
+    )
+
+
+@router.message(DurationNotes.typing)
+async def save_notes(
+    message: types.Message,
+    bot: Bot,
+    state: FSMContext,
+    account: Account
+):
+    if not message.text:
+        return await message.reply(
+            _("Sorry, but I can't process it. Try again.")
+        )
+
+    data = DurationNotesData.load(await state.get_data())
+    await state.clear()
+
+    if data is None or not await repository.set_notes(
+        account, data.duration_id, message.text
+    ):
+        return await message.answer(
+            _('Sorry, something unexpected happened. I can\'t process it.')
+        )
+
+    if data.explanation:
+        await bot.edit_message_reply_markup(**data.explanation.as_kwargs())
+
+    await message.answer(_('The note has been added to the time record.'))
@@ -1,9 +1,11 @@
 import pytz
 
 import link
+import repository
 from settings import LANGUAGES
-from models import database, Account, Task
-from state import ChangeTimezone
+from models import Account
+from dispatch import ActionTable
+from state import ChangeTimezone, ChangeTimezoneData, MessageRef
 
 from aiogram import Router, Bot, F, types
 from aiogram.filters import Command
@@ -14,6 +16,7 @@ from aiogram.fsm.context import FSMContext
 
 
 router = Router()
+actions = ActionTable()
 timezones_url = (
     'https://en.wikipedia.org/wiki/List_of_tz_database_time_zones'
     '#:~:text=numeric%20UTC%20offsets.-,List,-%5Bedit%5D'
@@ -65,9 +68,7 @@ async def help(message: types.Message):
     await message.answer(text)
 
 
-@router.callback_query(
-    F.data == link.Callback.cancel
-)
+@actions.register(link.Callback.cancel)
 async def cancel(
     callback: types.CallbackQuery, state: FSMContext, bot: Bot
 ):
@@ -81,7 +82,9 @@ async def cancel(
         )
 
 
-def get_settings(account: Account) -> tuple[str, types.InlineKeyboardMarkup]:
+async def get_settings(
+    account: Account
+) -> tuple[str, types.InlineKeyboardMarkup]:
     text = _(
         'Your settings\n\n'
         'Current language: %s\n'
@@ -99,7 +102,9 @@ def get_settings(account: Account) -> tuple[str, types.InlineKeyboardMarkup]:
         callback_data=link.Callback.change_timezone
     )
 
-    if account.folders.count() > 0:  # type: ignore
+    folders, tasks, completed = await repository.count_objects(account)
+
+    if folders > 0:
         builder.button(
             text=_('📁 Folders'),
             callback_data=link.Callback.folder_list
@@ -115,11 +120,6 @@ def get_settings(account: Account) -> tuple[str, types.InlineKeyboardMarkup]:
         )
     builder.adjust(1)
 
-    with database:
-        folders = account.folders.count()  # type: ignore
-        tasks = account.tasks.count()  # type: ignore
-        completed = account.tasks \
-            .where(Task.is_done == True).count()  # noqa # type: ignore
     end = ''
 
     if tasks:
@@ -140,18 +140,16 @@ def get_settings(account: Account) -> tuple[str, types.InlineKeyboardMarkup]:
     F.text == link.Text.settings
 )
 async def settings(message: types.Message, account: Account):
-    text, markup = get_settings(account)
+    text, markup = await get_settings(account)
 
     await message.answer(text, reply_markup=markup)
 
 
-@router.callback_query(
-    F.data == link.Callback.back_to_settings
-)
+@actions.register(link.Callback.back_to_settings)
 async def back_to_settings(
     callback: types.CallbackQuery, bot: Bot, account: Account
 ):
-    text, markup = get_settings(account)
+    text, markup = await get_settings(account)
 
     if not callback.message:
         return await bot.send_message(
@@ -164,9 +162,7 @@ async def back_to_settings(
     await bot.edit_message_reply_markup(chat, message, reply_markup=markup)
 
 
-@router.callback_query(
-    F.data == link.Callback.change_language
-)
+@actions.register(link.Callback.change_language)
 async def change_language(
     callback: types.CallbackQuery, bot: Bot, event_from_user: types.User
 ):
@@ -175,7 +171,7 @@ async def change_language(
     for code, name in LANGUAGES:
         builder.button(
             text=str(name),
-            callback_data=f'{link.Callback.set_language}/{code}'
+            callback_data=link.pack(link.Callback.set_language, code)
         )
 
     builder.button(
@@ -198,25 +194,22 @@ async def change_language(
     await callback.answer(text)
 
 
-@router.callback_query(
-    F.data.startswith(link.Callback.set_language)
-)
-async def set_language(callback: types.CallbackQuery, account: Account):
-    language_code = callback.data.split('/')[-1]  # type: ignore
+@actions.register(link.Callback.set_language)
+async def set_language(
+    callback: types.CallbackQuery, account: Account, params: dict
+):
+    language_code = params['code']
 
     if language_code in [available for available, __ in LANGUAGES]:
         account.language_code = language_code  # type: ignore
-        with database:
-            account.save()
+        await repository.save_account(account, Account.language_code)
 
         await callback.answer(_('Language successfully changed.'))
     else:
         await callback.answer(_("I can't set this language."))
 
 
-@router.callback_query(
-    F.data == link.Callback.change_timezone
-)
+@actions.register(link.Callback.change_timezone)
 async def change_timezone(callback: types.CallbackQuery,
                           bot: Bot,
                           state: FSMContext,
@@ -226,22 +219,21 @@ async def change_timezone(callback: types.CallbackQuery,
         'correct format. Below is the link to the list (TZ identifier) '
         'of possible options.'
     )
-    link = formatting.TextLink(_('Link'), url=timezones_url)
+    reference = formatting.TextLink(_('Link'), url=timezones_url)
 
     builder = keyboard.InlineKeyboardBuilder()
-    builder.button(text=_('⬅️ Cancel'), callback_data='cancel')
+    builder.button(text=_('⬅️ Cancel'), callback_data=link.Callback.cancel)
 
     await callback.answer(_('Send me your preferred time zone'))
     message = await bot.send_message(
         event_from_user.id,
-        **formatting.Text(text, '\n\n', link).as_kwargs(),
+        **formatting.Text(text, '\n\n', reference).as_kwargs(),
         reply_markup=builder.as_markup()
     )
 
     await state.set_state(ChangeTimezone.typing)
-    await state.set_data(
-        {'chat_id': message.chat.id, 'message_id': message.message_id}
-    )
+    data = ChangeTimezoneData(explanation=MessageRef.of(message))
+    await state.set_data(data.dump())
 
 
 @router.message(
@@ -259,12 +251,11 @@ async def set_timezone(message: types.Message,
         )
 
     account.timezone = timezone  # type: ignore
-    with database:
-        account.save()
+    await repository.save_account(account, Account.timezone)
 
-    data = await state.get_data()
-    if 'chat_id' in data and 'message_id' in data:
-        await bot.edit_message_reply_markup(**data)
+    data = ChangeTimezoneData.load(await state.get_data())
+    if data and data.explanation:
+        await bot.edit_message_reply_markup(**data.explanation.as_kwargs())
 
     await message.reply(_('Time zone successfully changed.'))
     await state.clear()
@@ -1,13 +1,15 @@
 import link
-from aiogram import types
+from aiogram import Bot, types
 from models import Task, Folder
 from aiogram.utils.i18n import gettext as _
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 
-# TODO: fix me
-
 def base_retrieve(task: Task) -> tuple[str, types.InlineKeyboardMarkup]:
+    '''
+    Renders the task loaded by repository.find_task
+    without any additional queries to the database
+    '''
 
     created_at = task.localized_created_at.strftime('%d.%m.%Y, %H:%M')
     folder = Folder(name=_('Main folder'))
@@ -28,11 +30,11 @@ def base_retrieve(task: Task) -> tuple[str, types.InlineKeyboardMarkup]:
 
     builder.button(
         text=_('✅ Mark done'),
-        callback_data=link.build(link.Call.Task.mark_done, id=id)
+        callback_data=link.pack(link.Call.Task.mark_done, id)
     )
     builder.button(
         text=_('🔄 Update'),
-        callback_data=link.build(link.Call.Task.update, id=id)
+        callback_data=link.pack(link.Call.Task.update, id)
     )
     builder.button(
         text=_('📁 Active folder'),
@@ -40,20 +42,20 @@ def base_retrieve(task: Task) -> tuple[str, types.InlineKeyboardMarkup]:
     )
     builder.button(
         text=_('❌ Remove'),
-        callback_data=link.build(link.Call.Task.remove, id=id)
+        callback_data=link.pack(link.Call.Task.remove, id)
     )
     builder.button(
         text=_('⏲️ Countdown'),
-        callback_data=link.build(link.Call.Task.start_countdown, id=id)
+        callback_data=link.pack(link.Call.Task.start_countdown, id)
     )
     builder.button(
         text=_('🔔 Reminder'),
-        callback_data=link.build(link.Call.Task.start_reminder, id=id)
+        callback_data=link.pack(link.Call.Task.start_reminder, id)
     )
-    if task.durations.count():  # type: ignore
+    if getattr(task, 'has_durations', False):
         builder.button(
             text=_('🕰️📈 Reports'),
-            callback_data=link.build(link.Call.Task.task_reports, id=id)
+            callback_data=link.pack(link.Call.Task.task_reports, id)
         )
     builder.adjust(2, 2, 2, 1)
 
@@ -61,3 +63,20 @@ def base_retrieve(task: Task) -> tuple[str, types.InlineKeyboardMarkup]:
     markup = builder.as_markup()
 
     return text, markup
+
+
+async def edit_callback_message(
+    callback: types.CallbackQuery,
+    bot: Bot,
+    user_id: int,
+    text: str,
+    markup: types.InlineKeyboardMarkup | None
+):
+    if callback.message:
+        msg: dict = {
+            'chat_id': callback.message.chat.id,
+            'message_id': callback.message.message_id
+        }
+        await bot.edit_message_text(text, **msg, reply_markup=markup)
+    else:
+        await bot.send_message(user_id, text, reply_markup=markup)
@@ -3,12 +3,63 @@ The module contains static classes
 representing links to various resources and actions
 '''
 
+import pytz
 from aiogram import types
-from urllib.parse import urlencode
+from datetime import datetime, timedelta
+from typing import Any, Callable, NamedTuple
 
 
-def build(link: str, **kwargs):
-    return link + '?' + urlencode(kwargs)
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+EPOCH = datetime(1970, 1, 1)
+SEPARATOR = ':'
+
+
+def to_base36(number: int) -> str:
+    if number < 0:
+        raise ValueError('The number must not be negative')
+
+    digits = ''
+    while True:
+        number, remainder = divmod(number, 36)
+        digits = DIGITS[remainder] + digits
+        if not number:
+            return digits
+
+
+def from_base36(digits: str) -> int:
+    '''
+    Reverse operation of to_base36, raises ValueError
+    '''
+    if not digits or not digits.isalnum():
+        raise ValueError(f'Invalid number: {digits!r}')
+    return int(digits, 36)
+
+
+def since_epoch(date: datetime, unit: timedelta) -> int:
+    if date.tzinfo is not None:
+        date = date.astimezone(pytz.utc).replace(tzinfo=None)
+    return (date - EPOCH) // unit
+
+
+class Field(NamedTuple):
+    '''
+    Converts a parameter of the callback data to the text and back
+    '''
+    encode: Callable[[Any], str]
+    decode: Callable[[str], Any]
+
+
+MICROSECOND = timedelta(microseconds=1)
+
+# Non-negative number
+INT = Field(to_base36, from_base36)
+# Naive UTC date to the microsecond, so that it can be compared exactly
+MICROSECONDS = Field(
+    lambda date: to_base36(since_epoch(date, MICROSECOND)),
+    lambda digits: EPOCH + from_base36(digits) * MICROSECOND
+)
+# Text without the separator
+STR = Field(str, str)
 
 
 class Command:
@@ -17,6 +68,10 @@ class Command:
     list = types.BotCommand(command='list', description='To-do list')
     folders = types.BotCommand(command='folders', description='To-do list')
     settings = types.BotCommand(command='settings', description='Settings')
+    timers = types.BotCommand(command='timers', description='Timers')
+    export = types.BotCommand(
+        command='export', description='Export time records'
+    )
     help = types.BotCommand(command='help', description='How it works?')
 
 
@@ -29,53 +84,153 @@ class Text:
 
 
 class Callback:
-    # Must be 1-64 bytes
-
-    cancel = 'cancel'
-    back_to_settings = 'back-to-settings'
-
-    change_active_folder = 'change-active-folder'
-    change_timezone = 'change-timezone'
-    change_language = 'change-language'
-    set_language = 'set-language'
-
-    folder_list = 'folder-list'
-    folder_list_page = 'folder-list-page'
-    folder_retrieve = 'folder-retrieve'
-    folder_create = 'folder-create'
-    folder_update = 'folder-update'
-    folder_delete = 'folder-delete'
-    folder_perform_delete = 'folder-perform-delete'
-    folder_cancel_delete = 'folder-cancel-delete'
-    set_active_folder = 'set-active-folder'
+    # Opcodes of the actions, the parameters are packed after them
+    # according to SCHEMA. The whole data must be 1-64 bytes.
+
+    cancel = 'x'
+    back_to_settings = 'bs'
+
+    change_timezone = 'ct'
+    change_language = 'cl'
+    set_language = 'sl'
+
+    folder_list = 'fl'
+    folder_list_after = 'fn'
+    folder_list_before = 'fp'
+    folder_retrieve = 'fr'
+    folder_create = 'fc'
+    folder_update = 'fu'
+    folder_delete = 'fd'
+    folder_perform_delete = 'fe'
+    folder_cancel_delete = 'fk'
+    set_active_folder = 'fa'
 
     class Folder:
         ...
 
     class Task:
-        list = 'task-list'
-        retrieve = 'task-retrieve'
-        create = 'task-create'
-        _end_create = 'task-end-create'
-        update = 'task-update'
-        remove = 'task-remove'
-        confirm_remove = 'task-confirm-remove'
-        start_countdown = 'task-start-countdown'
-        complete_countdown = 'end'
-        save_duration = 'task-save-duration'
-        mark_done = 'task-mark-done'
-        task_reports = 'task-reports'
-        back = 'back'
-        task_day_report = 'task-day-report'
-        task_week_report = 'task-week-report'
-        task_month_report = 'task-month-report'
-        folder_reports = 'folder-reports'
-        folder_back = 'folder-back'
-        folder_day_report = 'folder-day-report'
-        folder_week_report = 'folder-week-report'
-        folder_month_report = 'folder-month-report'
-        start_reminder = 'start-reminder'
+        list = 'tl'
+        list_after = 'tn'
+        list_before = 'tp'
+        retrieve = 'tr'
+        create = 'tc'
+        _end_create = 'te'
+        update = 'tu'
+        remove = 'td'
+        confirm_remove = 'tx'
+        start_countdown = 'tt'
+        mark_done = 'tm'
+        task_reports = 'rt'
+        back = 'tb'
+        task_day_report = 'r1'
+        task_week_report = 'r7'
+        task_month_report = 'r30'
+        folder_reports = 'rf'
+        folder_back = 'rb'
+        folder_day_report = 'f1'
+        folder_week_report = 'f7'
+        folder_month_report = 'f30'
+        account_week_report = 'a7'
+        account_month_report = 'a30'
+        start_reminder = 'tw'
+
+    class Timer:
+        list = 'ml'
+        retrieve = 'mr'
+        pause = 'mp'
+        resume = 'mu'
+        stop = 'ms'
+        discard = 'md'
 
 
 Cmd = Command
 Call = Callback
+
+
+# Parameters of the actions in the order they are packed,
+# the actions missing here have no parameters
+SCHEMA: dict[str, tuple[tuple[str, Field], ...]] = {
+    Call.set_language: (('code', STR),),
+    Call.folder_list_after: (('id', INT),),
+    Call.folder_list_before: (('id', INT),),
+    Call.folder_retrieve: (('id', INT),),
+    Call.folder_update: (('id', INT),),
+    Call.folder_delete: (('id', INT),),
+    Call.folder_perform_delete: (('id', INT),),
+    Call.set_active_folder: (('id', INT),),
+    Call.Task.list_after: (('at', MICROSECONDS), ('id', INT)),
+    Call.Task.list_before: (('at', MICROSECONDS), ('id', INT)),
+    **{
+        op: (('id', INT),) for op in (
+            Call.Task.retrieve,
+            Call.Task.update,
+            Call.Task.remove,
+            Call.Task.confirm_remove,
+            Call.Task.start_countdown,
+            Call.Task.mark_done,
+            Call.Task.task_reports,
+            Call.Task.back,
+            Call.Task.task_day_report,
+            Call.Task.task_week_report,
+            Call.Task.task_month_report,
+            Call.Task.start_reminder,
+            Call.Timer.retrieve,
+            Call.Timer.pause,
+            Call.Timer.resume,
+            Call.Timer.stop,
+            Call.Timer.discard,
+        )
+    },
+}
+
+
+class Action(NamedTuple):
+    '''
+    Callback data decoded into the opcode and its typed parameters
+    '''
+    op: str
+    params: dict[str, Any]
+
+
+def pack(op: str, *values: Any) -> str:
+    '''
+    Builds the callback data of the action, e.g.
+    pack(Call.Task.retrieve, 42) == 'tr:16'
+    '''
+    fields = SCHEMA.get(op, ())
+    if len(values) != len(fields):
+        raise TypeError(f'{op!r} takes {len(fields)} parameters')
+
+    parts = [op]
+    for (_, field), value in zip(fields, values):
+        part = field.encode(value)
+
+        if SEPARATOR in part:
+            raise ValueError(f'{part!r} contains the separator')
+        parts.append(part)
+
+    data = SEPARATOR.join(parts)
+    if len(data.encode()) > 64:
+        raise ValueError(f'{data!r} is longer than 64 bytes')
+    return data
+
+
+def unpack(data: str) -> Action | None:
+    '''
+    Reverse operation of pack, returns None if the
+    parameters do not match the schema of the action
+    '''
+    op, *parts = data.split(SEPARATOR)
+    fields = SCHEMA.get(op, ())
+
+    if len(parts) != len(fields):
+        return None
+
+    params = {}
+    try:
+        for (name, field), part in zip(fields, parts):
+            params[name] = field.decode(part)
+    except (ValueError, OverflowError):
+        return None
+
+    return Action(op, params)
@@ -1,7 +1,11 @@
 import sys
 import asyncio
+import storage
 import settings
 import middleware
+import monitoring
+from reports import backend as report_backend
+from reports.pool import pool as report_pool
 from handlers import router
 from aiohttp import web
 from aiogram import Bot, Dispatcher
@@ -19,13 +23,24 @@ def setup() -> tuple[Bot, Dispatcher]:
     i18n = I18n(path=settings.LOCALES_PATH,
                 default_locale=settings.LANGUAGE_CODE)
     bot = Bot(settings.TOKEN)
+    bot.session.middleware(middleware.CommitRequestMiddleware())
 
-    dispatcher = Dispatcher()
+    dispatcher = Dispatcher(storage=storage.create())
     dispatcher.include_router(router)
+    dispatcher.update.outer_middleware(middleware.UnitOfWorkMiddleware())
     dispatcher.update.outer_middleware(middleware.AccountMiddleware())
     dispatcher.update.outer_middleware(middleware.LanguageMiddleware(i18n))
 
     dispatcher.message.outer_middleware(middleware.CreateTaskOuterMiddleware())
+    dispatcher.callback_query.outer_middleware(middleware.ActionMiddleware())
+
+    # The text backend draws the reports without the worker processes
+    if report_backend.name == report_backend.IMAGE:
+        dispatcher.startup.register(report_pool.start)
+        dispatcher.shutdown.register(report_pool.close)
+
+    dispatcher.startup.register(monitoring.stats.start)
+    dispatcher.shutdown.register(monitoring.stats.stop)
 
     return bot, dispatcher
 
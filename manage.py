@@ -0,0 +1,54 @@
+'''
+Maintenance commands for the database. Usage: python manage.py <command>
+'''
+
+import argparse
+import models
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('init', help='create the tables and everything else')
+    commands.add_parser('indexes', help='create the missing indexes')
+    commands.add_parser(
+        'constraints', help='recreate the time record overlap constraint'
+    )
+    commands.add_parser(
+        'triggers', help='recreate the counter and rollup triggers'
+    )
+
+    recount = commands.add_parser(
+        'recount', help='recompute the counters of the accounts'
+    )
+    recount.add_argument(
+        'account', type=int, nargs='?', help='only this account'
+    )
+
+    rollup = commands.add_parser(
+        'rollup', help='rebuild the daily rollup of the time records'
+    )
+    rollup.add_argument(
+        'account', type=int, nargs='?', help='only this account'
+    )
+
+    args = parser.parse_args()
+
+    if args.command == 'init':
+        models.init()
+    elif args.command == 'indexes':
+        models.create_indexes()
+    elif args.command == 'constraints':
+        models.create_overlap_constraint()
+    elif args.command == 'triggers':
+        models.create_counter_triggers()
+        models.create_rollup_triggers()
+    elif args.command == 'recount':
+        models.recount(args.account)
+    elif args.command == 'rollup':
+        models.rebuild_rollup(args.account)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,20 @@
 import link
+import logging
 import settings
-from models import database, Account, Task
+import repository
+from models import Account
+from state import DraftTaskData
 
-from peewee import DoesNotExist
+from time import perf_counter
 from typing import Awaitable, Callable
 
-from aiogram import BaseMiddleware
+from aiogram import Bot, BaseMiddleware
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType
+)
 from aiogram.utils.i18n import gettext as _
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.utils.i18n.middleware import SimpleI18nMiddleware
@@ -15,6 +24,58 @@ from aiogram.dispatcher.event.bases import UNHANDLED
 
 Handler = Callable[[TelegramObject, dict], Awaitable]
 
+logger = logging.getLogger(__name__)
+
+
+class UnitOfWorkMiddleware(BaseMiddleware):
+    '''
+    Opens a repository session for the update, so that the middlewares and
+    the handler share one connection and one transaction. It is committed
+    after the handler, or rolled back if the handler fails. The requests
+    to Telegram commit it earlier, see CommitRequestMiddleware.
+    '''
+
+    async def __call__(
+        self, handler: Handler, event: TelegramObject, data: dict
+    ):
+        session = repository.Session()
+        token = repository.session.set(session)
+        started_at = perf_counter()
+
+        try:
+            response = await handler(event, data)
+        except BaseException:
+            await repository.finish(session, commit=False)
+            raise
+        finally:
+            repository.session.reset(token)
+
+        await repository.finish(session)
+        logger.debug(
+            'Update processed in %.3f s: %d queries in %d calls',
+            perf_counter() - started_at, session.queries, session.calls
+        )
+
+        return response
+
+
+class CommitRequestMiddleware(BaseRequestMiddleware):
+    '''
+    Commits the repository session of the update before each request to
+    the Bot API, so that the user is told about the changes only after
+    they are saved, and the connection and the row locks are released
+    while the request is waiting for Telegram
+    '''
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        await repository.commit()
+        return await make_request(bot, method)
+
 
 class AccountMiddleware(BaseMiddleware):
     async def __call__(
@@ -29,12 +90,9 @@ class AccountMiddleware(BaseMiddleware):
             if user.language_code in languages:  # type: ignore
                 language_code = user.language_code
 
-            with database:
-                account, _ = Account.get_or_create(
-                    id=user.id,
-                    defaults={'language_code': language_code}
-                )
-            data['account'] = account
+            data['account'] = await repository.get_or_create_account(
+                user.id, language_code  # type: ignore
+            )
 
         return await handler(event, data)
 
@@ -52,6 +110,21 @@ class LanguageMiddleware(SimpleI18nMiddleware):
         return await super().get_locale(event, data)
 
 
+class ActionMiddleware(BaseMiddleware):
+    '''
+    Decodes the data of the callback query once per update and adds the
+    action to the request context, where ActionFilter looks it up
+    '''
+
+    async def __call__(
+        self, handler: Handler, callback: CallbackQuery, data: dict
+    ):
+        if callback.data:
+            data['action'] = link.unpack(callback.data)
+
+        return await handler(callback, data)
+
+
 class TaskMiddleware(BaseMiddleware):
     '''
     Using the context parameter "params", it locates the
@@ -70,14 +143,7 @@ class TaskMiddleware(BaseMiddleware):
             task_id = params.get('id')
 
         if isinstance(account, Account) and isinstance(task_id, int):
-            task = None
-            with database:
-                try:
-                    # Does not depend on the account's active folder
-                    task = Task.select().where(Task.id == task_id,
-                                               Task.account == account).get()
-                except DoesNotExist:
-                    pass
+            task = await repository.get_task(account, task_id)
 
             if task:
                 data['task'] = task
@@ -117,9 +183,8 @@ class CreateTaskOuterMiddleware(BaseMiddleware):
             text = '\n\n'.join(lines)
             markup = builder.as_markup()
 
-            await data['state'].set_data({
-                'name': name, 'description': description
-            })
+            draft = DraftTaskData(name=name, description=description)
+            await data['state'].set_data(draft.dump())
             return await event.reply(text, reply_markup=markup)
 
         return response
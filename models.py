@@ -2,27 +2,527 @@
 
 import pytz
 import peewee
+import psycopg2
+import psycopg2.errors
 import settings
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from playhouse.pool import PooledPostgresqlDatabase
+from playhouse.postgres_ext import ArrayField
 from aiogram.utils.i18n import gettext as _
 
 
-database = peewee.PostgresqlDatabase(
-    settings.DB_NAME,
-    user=settings.DB_USER,
-    password=settings.DB_PASSWORD,
-    host=settings.DB_HOST
-)
+class QueryCounter:
+    '''
+    Counts the queries executed in the current thread in the "queries"
+    attribute of the connection state, it is reset by the code reading it
+    '''
+
+    def execute_sql(self, sql, *args, **kwargs):
+        state = self._state  # type: ignore
+        state.queries = getattr(state, 'queries', 0) + 1
+        return super().execute_sql(sql, *args, **kwargs)  # type: ignore
+
+
+class Database(QueryCounter, peewee.PostgresqlDatabase):
+    ...
+
+
+class PooledDatabase(QueryCounter, PooledPostgresqlDatabase):
+    '''
+    Connection pool that optionally pings a connection before handing
+    it out, so connections dropped by the server or a proxy are
+    discarded instead of failing the first query of an update
+    '''
+
+    def __init__(self, *args, health_check: bool = True, **kwargs):
+        self.health_check = health_check
+        super().__init__(*args, **kwargs)
+
+    def _is_closed(self, conn) -> bool:
+        if super()._is_closed(conn):
+            return True
+        if not self.health_check:
+            return False
+
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except psycopg2.Error:
+            return True
+
+        return False
+
+
+def create_database() -> peewee.PostgresqlDatabase:
+    '''
+    Creates the database according to settings.py file. Unless DB_POOL is
+    disabled, "with database:" takes a connection from the pool and returns
+    it on exit instead of opening a new session to the server every time.
+    '''
+    credentials = {
+        'user': settings.DB_USER,
+        'password': settings.DB_PASSWORD,
+        'host': settings.DB_HOST,
+    }
+
+    if not getattr(settings, 'DB_POOL', True):
+        return Database(settings.DB_NAME, **credentials)
+
+    return PooledDatabase(
+        settings.DB_NAME,
+        # Maximum number of simultaneously open connections
+        max_connections=getattr(settings, 'DB_POOL_MAX_SIZE', 20),
+        # Seconds after which an idle connection is reopened
+        stale_timeout=getattr(settings, 'DB_POOL_STALE_TIMEOUT', 300),
+        # Seconds to wait for a free connection when the pool is exhausted
+        timeout=getattr(settings, 'DB_POOL_TIMEOUT', 10),
+        health_check=getattr(settings, 'DB_POOL_HEALTH_CHECK', True),
+        **credentials
+    )
+
+
+database = create_database()
 
 
 def utc_now():
     return datetime.now(pytz.utc)
 
 
+# Indexes for the hot queries of the handlers and reports. Run
+# "python explain.py" to check that the queries are served by them.
+INDEXES = [
+    # Incomplete tasks of a folder, newest first (task list)
+    'CREATE INDEX IF NOT EXISTS task_folder_open_idx '
+    'ON task (folder_id, created_at, id) '
+    'WHERE NOT is_done',
+    # Incomplete tasks of the main folder, newest first (task list)
+    'CREATE INDEX IF NOT EXISTS task_main_open_idx '
+    'ON task (account_id, created_at, id) '
+    'WHERE folder_id IS NULL AND NOT is_done',
+    # Number of tasks and completed tasks of the account (settings)
+    'CREATE INDEX IF NOT EXISTS task_account_done_idx '
+    'ON task (account_id, is_done)',
+    # Folders of the account (folder list)
+    'CREATE INDEX IF NOT EXISTS folder_account_name_idx '
+    'ON folder (account_id, name, id)',
+    # Time records of a task for a period (daily rollup), the end is
+    # included so that the days are recomputed by an index-only scan
+    'CREATE INDEX IF NOT EXISTS duration_task_start_idx '
+    'ON duration (task_id, start) INCLUDE ("end")',
+    # Timers of the account in the order they were started (timer list)
+    'CREATE INDEX IF NOT EXISTS timer_account_started_idx '
+    'ON timer (account_id, started_at) INCLUDE (resumed_at, elapsed)',
+]
+
+
+def create_indexes():
+    '''
+    Creates the missing indexes, it is safe to run on an existing database
+    '''
+    with database:
+        # The timers are indexed, the table is missing on the databases
+        # created before them
+        database.create_tables([Timer])
+        for index in INDEXES:
+            database.execute_sql(index)
+
+
+# Time records of one task (or of all tasks of one account, depending on
+# settings.DURATION_OVERLAP_SCOPE) must not intersect. The ranges are
+# closed as in the previous check, tsrange is used because the columns
+# are timestamps without a time zone.
+OVERLAP_SCOPES = {'task': 'task_id', 'account': 'account_id'}
+
+
+# Adds the account of the time records to a database created before the
+# column, as create_tables does: the backfilled column is required and
+# must match the account of the task
+DURATION_ACCOUNT = [
+    'ALTER TABLE duration '
+    'ADD COLUMN IF NOT EXISTS account_id BIGINT '
+    'REFERENCES account (id) ON DELETE CASCADE',
+    'UPDATE duration SET account_id = task.account_id '
+    'FROM task WHERE task.id = duration.task_id '
+    'AND duration.account_id IS NULL',
+    'ALTER TABLE duration ALTER COLUMN account_id SET NOT NULL',
+    'CREATE INDEX IF NOT EXISTS duration_account_id '
+    'ON duration (account_id)',
+    '''
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint
+            WHERE conrelid = 'duration'::regclass
+            AND conname = 'duration_task_id_account_id_fkey'
+        ) THEN
+            ALTER TABLE duration
+            ADD CONSTRAINT duration_task_id_account_id_fkey
+            FOREIGN KEY (task_id, account_id)
+            REFERENCES task (id, account_id);
+        END IF;
+    END
+    $$
+    ''',
+]
+
+
+def create_overlap_constraint():
+    '''
+    Creates (or recreates for the scope from settings) the exclusion
+    constraint on the time records. Its GiST index also serves the search
+    for an intersecting record. It is safe to run on an existing database.
+    '''
+    scope = getattr(settings, 'DURATION_OVERLAP_SCOPE', 'task')
+    column = OVERLAP_SCOPES[scope]
+
+    with database:
+        database.execute_sql('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for statement in DURATION_ACCOUNT:
+            database.execute_sql(statement)
+        database.execute_sql(
+            'ALTER TABLE duration '
+            'DROP CONSTRAINT IF EXISTS duration_overlap_excl'
+        )
+        database.execute_sql(
+            'ALTER TABLE duration '
+            'ADD CONSTRAINT duration_overlap_excl '
+            f'EXCLUDE USING gist ({column} WITH =, '
+            'tsrange("start", "end", \'[]\') WITH &&)'
+        )
+
+
+# Triggers keeping the numbers of folders, tasks and completed tasks of
+# the account in the counter table, including cascading deletions, and
+# the version of the data of its reports, which is increased by every
+# change of the time records and of the tasks and folders shown in the
+# reports
+COUNTER_TRIGGERS = [
+    'ALTER TABLE counter '
+    'ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0',
+    # The column created by create_tables has no default in the database
+    'ALTER TABLE counter ALTER COLUMN version SET DEFAULT 0',
+    '''
+    CREATE OR REPLACE FUNCTION counter_change(
+        target BIGINT, d_folders INT, d_tasks INT, d_completed INT
+    ) RETURNS void AS $$
+    BEGIN
+        -- The account itself may be in the process of deletion
+        INSERT INTO counter (account_id, folders, tasks, completed)
+        SELECT target, d_folders, d_tasks, d_completed
+        WHERE EXISTS (SELECT 1 FROM account WHERE id = target)
+        ON CONFLICT (account_id) DO UPDATE SET
+            folders = counter.folders + EXCLUDED.folders,
+            tasks = counter.tasks + EXCLUDED.tasks,
+            completed = counter.completed + EXCLUDED.completed;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE OR REPLACE FUNCTION folder_counter() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM counter_change(NEW.account_id, 1, 0, 0);
+        ELSE
+            PERFORM counter_change(OLD.account_id, -1, 0, 0);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE OR REPLACE FUNCTION task_counter() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM counter_change(
+                OLD.account_id, 0, -1, -OLD.is_done::INT
+            );
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM counter_change(NEW.account_id, 0, 1, NEW.is_done::INT);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    'DROP TRIGGER IF EXISTS folder_counter ON folder',
+    'CREATE TRIGGER folder_counter AFTER INSERT OR DELETE ON folder '
+    'FOR EACH ROW EXECUTE FUNCTION folder_counter()',
+    'DROP TRIGGER IF EXISTS task_counter ON task',
+    'CREATE TRIGGER task_counter AFTER INSERT OR DELETE ON task '
+    'FOR EACH ROW EXECUTE FUNCTION task_counter()',
+    'DROP TRIGGER IF EXISTS task_counter_update ON task',
+    'CREATE TRIGGER task_counter_update AFTER UPDATE ON task FOR EACH ROW '
+    'WHEN (OLD.is_done IS DISTINCT FROM NEW.is_done '
+    'OR OLD.account_id IS DISTINCT FROM NEW.account_id) '
+    'EXECUTE FUNCTION task_counter()',
+    '''
+    CREATE OR REPLACE FUNCTION report_version() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE counter SET version = version + 1
+            WHERE account_id = OLD.account_id;
+        END IF;
+        IF TG_OP = 'INSERT' OR (
+            TG_OP = 'UPDATE' AND OLD.account_id IS DISTINCT FROM NEW.account_id
+        ) THEN
+            UPDATE counter SET version = version + 1
+            WHERE account_id = NEW.account_id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    'DROP TRIGGER IF EXISTS duration_report_version ON duration',
+    # The notes of the records are not shown in the reports
+    'CREATE TRIGGER duration_report_version '
+    'AFTER INSERT OR DELETE '
+    'OR UPDATE OF task_id, account_id, start, "end" ON duration '
+    'FOR EACH ROW EXECUTE FUNCTION report_version()',
+    'DROP TRIGGER IF EXISTS task_report_version ON task',
+    'CREATE TRIGGER task_report_version AFTER UPDATE ON task FOR EACH ROW '
+    'WHEN (OLD.name IS DISTINCT FROM NEW.name '
+    'OR OLD.is_done IS DISTINCT FROM NEW.is_done '
+    'OR OLD.folder_id IS DISTINCT FROM NEW.folder_id) '
+    'EXECUTE FUNCTION report_version()',
+    # The names of the folders are shown in the account-wide report
+    'DROP TRIGGER IF EXISTS folder_report_version ON folder',
+    'CREATE TRIGGER folder_report_version AFTER UPDATE OF name ON folder '
+    'FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name) '
+    'EXECUTE FUNCTION report_version()',
+]
+
+COUNTER_RECOUNT = '''
+INSERT INTO counter (account_id, folders, tasks, completed)
+SELECT
+    account.id,
+    (SELECT COUNT(*) FROM folder WHERE folder.account_id = account.id),
+    (SELECT COUNT(*) FROM task WHERE task.account_id = account.id),
+    (
+        SELECT COUNT(*) FROM task
+        WHERE task.account_id = account.id AND task.is_done
+    )
+FROM account
+{where}
+ON CONFLICT (account_id) DO UPDATE SET
+    folders = EXCLUDED.folders,
+    tasks = EXCLUDED.tasks,
+    completed = EXCLUDED.completed
+'''
+
+
+def create_counter_triggers():
+    '''
+    Creates the counter table if it is missing and (re)creates its
+    triggers, it is safe to run on an existing database
+    '''
+    with database:
+        database.create_tables([Counter])
+        for statement in COUNTER_TRIGGERS:
+            database.execute_sql(statement)
+
+
+def recount(account_id: int | None = None):
+    '''
+    Recomputes the counters of the account or of all accounts
+    '''
+    with database:
+        if account_id is None:
+            database.execute_sql(COUNTER_RECOUNT.format(where=''))
+        else:
+            database.execute_sql(
+                COUNTER_RECOUNT.format(where='WHERE account.id = %s'),
+                (account_id,)
+            )
+
+
+# Triggers keeping the daily rollup of the time records up to date in
+# the transaction changing them. The local days touched by a changed
+# record are recomputed from the records of its task, and all days of
+# the account are recomputed when its time zone changes. The records
+# are cut into 15 minute UTC slices, each of which lies within a single
+# local hour, since the offsets of the time zones are multiples of it.
+ROLLUP_TRIGGERS = [
+    '''
+    CREATE OR REPLACE FUNCTION rollup_zone(name TEXT) RETURNS TEXT AS $$
+    BEGIN
+        PERFORM now() AT TIME ZONE name;
+        RETURN name;
+    EXCEPTION WHEN invalid_parameter_value THEN
+        -- Like reports.utils.get_timezone, an unknown zone is UTC
+        RETURN 'UTC';
+    END
+    $$ LANGUAGE plpgsql STABLE STRICT
+    ''',
+    '''
+    CREATE OR REPLACE FUNCTION rollup_refresh(
+        target BIGINT, zone TEXT, first_day DATE, last_day DATE
+    ) RETURNS void AS $$
+    DECLARE
+        since TIMESTAMP := first_day::TIMESTAMP
+            AT TIME ZONE zone AT TIME ZONE 'UTC';
+        until TIMESTAMP := (last_day + 1)::TIMESTAMP
+            AT TIME ZONE zone AT TIME ZONE 'UTC';
+    BEGIN
+        DELETE FROM daily_rollup
+        WHERE task_id = target AND day BETWEEN first_day AND last_day;
+
+        INSERT INTO daily_rollup (task_id, day, seconds, hours)
+        WITH slice AS (
+            SELECT
+                point AT TIME ZONE 'UTC' AT TIME ZONE zone AS local,
+                EXTRACT(EPOCH FROM
+                    LEAST(point + INTERVAL '15 minutes', duration."end", until)
+                    - GREATEST(point, duration.start, since)
+                )::FLOAT8 AS seconds
+            FROM duration, generate_series(
+                date_trunc('hour', GREATEST(duration.start, since)),
+                LEAST(duration."end", until),
+                INTERVAL '15 minutes'
+            ) AS point
+            WHERE duration.task_id = target
+                AND duration."end" > since AND duration.start < until
+        ), hourly AS (
+            SELECT
+                local::DATE AS day,
+                EXTRACT(HOUR FROM local)::INT AS hour,
+                SUM(seconds) AS seconds
+            FROM slice
+            WHERE seconds > 0
+            GROUP BY 1, 2
+        )
+        SELECT target, total.day, total.seconds, ARRAY(
+            SELECT COALESCE(hourly.seconds, 0)
+            FROM generate_series(0, 23) AS slot
+            LEFT JOIN hourly
+                ON hourly.day = total.day AND hourly.hour = slot
+            ORDER BY slot
+        )
+        FROM (
+            SELECT day, SUM(seconds) AS seconds FROM hourly GROUP BY day
+        ) AS total
+        ON CONFLICT (task_id, day) DO UPDATE SET
+            seconds = EXCLUDED.seconds,
+            hours = EXCLUDED.hours;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE OR REPLACE FUNCTION rollup_span(
+        target BIGINT, since TIMESTAMP, until TIMESTAMP
+    ) RETURNS void AS $$
+    DECLARE
+        zone TEXT;
+    BEGIN
+        SELECT rollup_zone(account.timezone) INTO zone
+        FROM task JOIN account ON account.id = task.account_id
+        WHERE task.id = target;
+
+        -- The task itself may be in the process of deletion
+        IF zone IS NOT NULL THEN
+            PERFORM rollup_refresh(
+                target,
+                zone,
+                (since AT TIME ZONE 'UTC' AT TIME ZONE zone)::DATE,
+                (until AT TIME ZONE 'UTC' AT TIME ZONE zone)::DATE
+            );
+        END IF;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE OR REPLACE FUNCTION rollup_rebuild(target BIGINT)
+    RETURNS void AS $$
+    DECLARE
+        zone TEXT;
+        span RECORD;
+    BEGIN
+        SELECT rollup_zone(timezone) INTO zone
+        FROM account WHERE id = target;
+
+        DELETE FROM daily_rollup USING task
+        WHERE task.id = daily_rollup.task_id AND task.account_id = target;
+
+        FOR span IN
+            SELECT
+                duration.task_id,
+                MIN(duration.start) AS since,
+                MAX(duration."end") AS until
+            FROM duration JOIN task ON task.id = duration.task_id
+            WHERE task.account_id = target
+            GROUP BY duration.task_id
+        LOOP
+            PERFORM rollup_refresh(
+                span.task_id,
+                zone,
+                (span.since AT TIME ZONE 'UTC' AT TIME ZONE zone)::DATE,
+                (span.until AT TIME ZONE 'UTC' AT TIME ZONE zone)::DATE
+            );
+        END LOOP;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE OR REPLACE FUNCTION duration_rollup() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM rollup_span(OLD.task_id, OLD.start, OLD."end");
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM rollup_span(NEW.task_id, NEW.start, NEW."end");
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE OR REPLACE FUNCTION account_rollup() RETURNS trigger AS $$
+    BEGIN
+        PERFORM rollup_rebuild(NEW.id);
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    'DROP TRIGGER IF EXISTS duration_rollup ON duration',
+    # The notes of the records are not a part of the rollup
+    'CREATE TRIGGER duration_rollup '
+    'AFTER INSERT OR DELETE OR UPDATE OF task_id, start, "end" ON duration '
+    'FOR EACH ROW EXECUTE FUNCTION duration_rollup()',
+    'DROP TRIGGER IF EXISTS account_rollup ON account',
+    'CREATE TRIGGER account_rollup AFTER UPDATE ON account FOR EACH ROW '
+    'WHEN (OLD.timezone IS DISTINCT FROM NEW.timezone) '
+    'EXECUTE FUNCTION account_rollup()',
+]
+
+
+def create_rollup_triggers():
+    '''
+    Creates the rollup table if it is missing and (re)creates its
+    triggers, it is safe to run on an existing database
+    '''
+    with database:
+        database.create_tables([DailyRollup])
+        for statement in ROLLUP_TRIGGERS:
+            database.execute_sql(statement)
+
+
+def rebuild_rollup(account_id: int | None = None):
+    '''
+    Recomputes the daily rollup of the account or of all accounts
+    '''
+    with database:
+        if account_id is None:
+            database.execute_sql('SELECT rollup_rebuild(id) FROM account')
+        else:
+            database.execute_sql(
+                'SELECT rollup_rebuild(id) FROM account WHERE id = %s',
+                (account_id,)
+            )
+
+
 def init():
     with database:
         database.create_tables(
-            [Account, Folder, Task, Duration]
+            [Account, Folder, Task, Duration, Counter, Timer, DailyRollup]
         )
         database.execute_sql(
             'ALTER TABLE account '
@@ -32,6 +532,13 @@ def init():
             'ON DELETE SET NULL'
         )
 
+    create_indexes()
+    create_overlap_constraint()
+    create_counter_triggers()
+    recount()
+    create_rollup_triggers()
+    rebuild_rollup()
+
 
 class Account(peewee.Model):
     _timezones = [(tz, tz) for tz in pytz.all_timezones]
@@ -113,8 +620,6 @@ class Task(peewee.Model):
     created_at: datetime
     durations: peewee.ModelSelect
 
-    # TODO: Different tasks should not have the same execution time!
-
     @property
     def localized_created_at(self) -> datetime:
         try:
@@ -147,12 +652,20 @@ class Duration(peewee.Model):
         on_delete='CASCADE',
         related_name='durations'
     )
+    # Copy of the task's account, which allows the database
+    # to check intersections between all tasks of the account
+    account = peewee.ForeignKeyField(
+        Account,
+        on_delete='CASCADE',
+        backref='durations'
+    )
 
     end = peewee.DateTimeField()
     start = peewee.DateTimeField()
     notes = peewee.TextField(null=True)
 
     task: Task
+    account: Account
     end: datetime
     start: datetime
     notes: str | None
@@ -185,39 +698,82 @@ class Duration(peewee.Model):
     def validate(
         task: Task, start: datetime, end: datetime, notes: str | None = None
     ):
-        if start > end:
+        # Countdowns are recorded to the second, and an empty
+        # range would violate the check constraint of the table
+        if start >= end:
             raise ValueError(_('Can\'t process it. Invalid data received.'))
 
-        query = task.durations.where(
-            ((start <= Duration.start) & (Duration.start <= end))
-            | ((start <= Duration.end) & (Duration.end <= end))
-            | ((Duration.start <= start) & (start <= Duration.end))
-            | ((Duration.start <= end) & (end <= Duration.end))
+    @staticmethod
+    def find_overlap(
+        task: Task, start: datetime, end: datetime
+    ) -> 'Duration | None':
+        '''
+        Finds a record intersecting with the given range within
+        the scope of the exclusion constraint, using its index
+        '''
+        intersects = peewee.Expression(
+            peewee.fn.tsrange(Duration.start, Duration.end, '[]'),
+            '&&',
+            peewee.fn.tsrange(start, end, '[]')
         )
-        overlap = query.first()  # type: ignore
-
-        if overlap is not None:
-            # TODO: Update message text
-            overlap_error_message = _(
-                "Sorry, I can't register this entry for the task \"%s\" "
-                "because there's already another one intersecting with "
-                "it – its start %s (duration %s)"
-            ) % (
-                task.name,
-                overlap.start.strftime('%d.%m.%Y, %H:%M'),
-                (overlap.end - overlap.start)
-            )
-            if overlap.notes:
-                overlap_error_message += " and note %s" % overlap.notes
+        query = Duration.select().where(intersects)
+
+        if getattr(settings, 'DURATION_OVERLAP_SCOPE', 'task') == 'account':
+            query = query.where(Duration.account == task.account_id)
+        else:
+            query = query.where(Duration.task == task)
+
+        return query.first()  # type: ignore
 
-            raise ValueError(overlap_error_message)
+    @staticmethod
+    def overlap_error(task: Task, overlap: 'Duration') -> ValueError:
+        # TODO: Update message text
+        overlap_error_message = _(
+            "Sorry, I can't register this entry for the task \"%s\" "
+            "because there's already another one intersecting with "
+            "it – its start %s (duration %s)"
+        ) % (
+            task.name,
+            overlap.start.strftime('%d.%m.%Y, %H:%M'),
+            (overlap.end - overlap.start)
+        )
+        if overlap.notes:
+            overlap_error_message += " and note %s" % overlap.notes
+
+        return ValueError(overlap_error_message)
 
     @classmethod
     def create(cls, validate: bool = True, **attributes):
-        if validate:
-            cls.convert_dates(attributes)
-            cls.validate(**attributes)
-        return super().create(**attributes)
+        '''
+        Intersections are detected by the exclusion constraint, so there
+        is no race between the check and the insertion. With validation
+        enabled, the violation is turned into a ValueError with a message.
+        '''
+        if not validate:
+            return super().create(**attributes)
+
+        cls.convert_dates(attributes)
+        cls.validate(**attributes)
+
+        task = attributes['task']
+        attributes.setdefault('account', task.account_id)
+
+        try:
+            with database.atomic():
+                return super().create(**attributes)
+        except peewee.IntegrityError as error:
+            violation = psycopg2.errors.ExclusionViolation
+            if not isinstance(getattr(error, 'orig', None), violation):
+                raise
+
+        overlap = cls.find_overlap(
+            task, attributes['start'], attributes['end']
+        )
+        if overlap is None:
+            # The intersecting record has already been deleted
+            return super().create(**attributes)
+
+        raise cls.overlap_error(task, overlap)
 
     @property
     def value(self) -> timedelta:
@@ -225,4 +781,146 @@ class Duration(peewee.Model):
 
     class Meta:
         database = database
-        constraints = [peewee.Check('"start" < "end"')]
+        constraints = [
+            peewee.Check('"start" < "end"'),
+            peewee.SQL(
+                'FOREIGN KEY (task_id, account_id) '
+                'REFERENCES task (id, account_id)'
+            ),
+        ]
+
+
+class Counter(peewee.Model):
+    '''
+    Numbers of objects of the account, which are kept up to date by the
+    triggers from COUNTER_TRIGGERS, so they are read with a single row
+    '''
+    account = peewee.ForeignKeyField(
+        Account,
+        primary_key=True,
+        on_delete='CASCADE'
+    )
+    folders = peewee.IntegerField(default=0)
+    tasks = peewee.IntegerField(default=0)
+    completed = peewee.IntegerField(default=0)
+    # Increased by COUNTER_TRIGGERS, a part of the keys of cached reports
+    version = peewee.BigIntegerField(
+        default=0, constraints=[peewee.SQL('DEFAULT 0')]
+    )
+
+    account: Account
+    folders: int
+    tasks: int
+    completed: int
+    version: int
+
+    class Meta:
+        database = database
+
+
+class DailyRollup(peewee.Model):
+    '''
+    Time recorded for the task on a local day of the account in seconds,
+    in total and within each of the local hours. It is kept up to date
+    by the triggers from ROLLUP_TRIGGERS, so the reports read a row per
+    day instead of the time records.
+    '''
+    # Indexed by the primary key
+    task = peewee.ForeignKeyField(
+        Task,
+        index=False,
+        on_delete='CASCADE',
+        backref='rollups'
+    )
+    day = peewee.DateField()
+    seconds = peewee.DoubleField(default=0)
+    # The repeated hour of the day the clocks go back is summed up in
+    # a single bucket, and the skipped one is empty
+    hours = ArrayField(peewee.DoubleField, default=lambda: [0.0] * 24)
+
+    task: Task
+    day: date
+    seconds: float
+    hours: list[float]
+
+    class Meta:
+        database = database
+        table_name = 'daily_rollup'
+        primary_key = peewee.CompositeKey('task', 'day')
+
+
+class Timer(peewee.Model):
+    '''
+    Countdown of a task kept on the server, a task has at most one. Each
+    running period is recorded as a time record when the timer is paused
+    or stopped, "elapsed" is the sum of the recorded periods in seconds
+    and "resumed_at" is the start of the current one (None if paused).
+    '''
+    task = peewee.ForeignKeyField(
+        Task,
+        unique=True,
+        on_delete='CASCADE',
+        backref='timers'
+    )
+    # Indexed by timer_account_started_idx
+    account = peewee.ForeignKeyField(
+        Account,
+        index=False,
+        on_delete='CASCADE',
+        backref='timers'
+    )
+    started_at = peewee.DateTimeField(default=utc_now)
+    resumed_at = peewee.DateTimeField(null=True, default=utc_now)
+    elapsed = peewee.IntegerField(default=0)
+
+    task: Task
+    account: Account
+    started_at: datetime
+    resumed_at: datetime | None
+    elapsed: int
+
+    @property
+    def is_running(self) -> bool:
+        return self.resumed_at is not None
+
+    def total(self, now: datetime) -> timedelta:
+        '''
+        Time counted by the timer by the given naive UTC date
+        '''
+        total = timedelta(seconds=self.elapsed)
+        if self.resumed_at is not None and now > self.resumed_at:
+            total += now - self.resumed_at
+        return total
+
+    def close(self, now: datetime, notes: str | None = None):
+        '''
+        Ends the running period at the given naive UTC date and records it,
+        ValueError is raised if the record intersects with another one.
+        Returns the created time record, or None if the timer is paused.
+        '''
+        if self.resumed_at is None:
+            return None
+
+        duration = None
+        # A period shorter than the precision of the column is dropped
+        if now > self.resumed_at:
+            duration = Duration.create(
+                validate=True,
+                task=self.task,
+                start=self.resumed_at,
+                end=now,
+                notes=notes
+            )
+            self.elapsed += int((now - self.resumed_at).total_seconds())
+
+        self.resumed_at = None
+        return duration
+
+    class Meta:
+        database = database
+        constraints = [
+            peewee.SQL(
+                'FOREIGN KEY (task_id, account_id) '
+                'REFERENCES task (id, account_id)'
+            ),
+        ]
@@ -0,0 +1,63 @@
+'''
+Periodic logging of the counters kept for monitoring: the hits of the
+caches, the timings of the actions of the callback queries and the load
+of the report pool
+'''
+
+import asyncio
+import logging
+import settings
+import repository
+from handlers import actions
+from reports import backend as report_backend
+from reports.cache import cache as report_cache
+from reports.pool import pool as report_pool
+
+
+logger = logging.getLogger(__name__)
+
+
+def log_stats():
+    logger.info('Account cache: %s', repository.accounts.stats())
+    logger.info('Report cache: %s', report_cache.memory.stats())
+
+    if report_backend.name == report_backend.IMAGE:
+        logger.info('Report pool: %s', report_pool.stats())
+
+    for op, timing in sorted(actions.stats().items()):
+        logger.info(
+            'Action %r: %d calls, %.3f s in total, %.3f s at most',
+            op, timing['calls'], timing['total'], timing['max']
+        )
+
+
+class StatsLogger:
+    '''
+    Background task writing the counters to the log every interval
+    of seconds while the dispatcher is running, and once on shutdown
+    '''
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.task: asyncio.Task | None = None
+
+    async def start(self):
+        if self.interval > 0 and self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            log_stats()
+
+    async def stop(self):
+        if self.task is None:
+            return
+
+        self.task.cancel()
+        self.task = None
+        log_stats()
+
+
+# 0 disables the logging
+stats = StatsLogger(getattr(settings, 'STATS_INTERVAL', 15 * 60))
@@ -2,8 +2,8 @@ import asyncio
 import settings
 from aiogram import Bot
 from celery import Celery
-from peewee import DoesNotExist
-from models import database, Account, Task
+from models import database
+from repository import find_task
 from aiogram.utils.i18n import I18n
 from handlers.utils import base_retrieve
 from aiogram.utils.i18n import gettext as _
@@ -18,11 +18,11 @@ async def send(account_id: int, task_id: int):
     It will be executed asynchronously in a task queue.
     '''
     with database:
-        try:
-            account = Account.get(id=account_id)
-            task = Task.get(id=task_id)
-        except DoesNotExist:
-            return
+        task = find_task(account_id, task_id)
+
+    if task is None:
+        return
+    account = task.account
 
     i18n = I18n(path=settings.LOCALES_PATH,
                 default_locale=settings.LANGUAGE_CODE)
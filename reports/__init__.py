@@ -1,2 +1,6 @@
+from . import pool  # noqa
+from . import backend  # noqa
+from . import cache  # noqa
 from . import task  # noqa
 from . import folder  # noqa
+from . import account  # noqa
@@ -0,0 +1,145 @@
+'''
+Report of the time of all tasks of the account across the folders. It
+is read by a single grouped query over the daily rollup, which keeps
+the tasks with the most time as separate series and folds the rest into
+one, so the size of the chart does not depend on the number of tasks,
+and sums up the time of each folder for the footer of the chart.
+'''
+
+import settings
+from datetime import date, timedelta
+from aiogram.utils.i18n import gettext as _
+
+from . import utils
+from . import render
+from . import backend
+from models import database, Account
+from repository import threaded
+
+
+# Tasks and folders shown separately, the others are summed up
+TOP = getattr(settings, 'REPORT_TOP_TASKS', 7)
+TOP_FOLDERS = getattr(settings, 'REPORT_TOP_FOLDERS', 4)
+
+# Seconds of the top tasks and of the other tasks (task_id is NULL) by
+# day, and the subtotals of the folders over the period (the main one
+# has folder_id NULL), which are told apart by the "subtotal" column
+QUERY = '''
+WITH ranking AS (
+    SELECT
+        daily_rollup.task_id,
+        ROW_NUMBER() OVER (
+            ORDER BY SUM(daily_rollup.seconds) DESC, daily_rollup.task_id
+        ) AS rank
+    FROM daily_rollup
+    JOIN task ON task.id = daily_rollup.task_id
+    WHERE task.account_id = %(account)s
+        AND daily_rollup.day BETWEEN %(first)s AND %(last)s
+    GROUP BY daily_rollup.task_id
+), entry AS (
+    SELECT
+        CASE WHEN ranking.rank <= %(top)s THEN task.id END AS task_id,
+        CASE WHEN ranking.rank <= %(top)s THEN task.name END AS name,
+        CASE WHEN ranking.rank <= %(top)s THEN ranking.rank END AS rank,
+        task.folder_id,
+        folder.name AS folder,
+        daily_rollup.day,
+        daily_rollup.seconds
+    FROM daily_rollup
+    JOIN ranking ON ranking.task_id = daily_rollup.task_id
+    JOIN task ON task.id = daily_rollup.task_id
+    LEFT JOIN folder ON folder.id = task.folder_id
+    WHERE daily_rollup.day BETWEEN %(first)s AND %(last)s
+)
+SELECT
+    task_id, name, day, folder, SUM(seconds),
+    GROUPING(folder_id) = 0 AS subtotal
+FROM entry
+GROUP BY GROUPING SETS ((task_id, name, rank, day), (folder_id, folder))
+ORDER BY rank NULLS LAST, day
+'''
+
+Series = list[tuple[str | None, list[float]]]
+
+
+@threaded
+def chronology(
+    account: Account, count: int
+) -> tuple[date, Series, list[tuple[str | None, float]]]:
+    '''
+    Returns the first day of the period, the hours of activity of each
+    day of the top tasks and of the others (named None), and the hours
+    of each folder (the main one is named None) in descending order.
+    ValueError is raised if there are no time records.
+    '''
+    timezone = utils.get_timezone(account.timezone)
+    first = utils.period(timezone, count)[0]
+
+    cursor = database.execute_sql(QUERY, {
+        'account': account.id,
+        'first': first,
+        'last': first + timedelta(days=count),
+        'top': TOP,
+    })
+
+    series: dict[int | None, tuple[str | None, list[float]]] = {}
+    folders = []
+
+    for task_id, name, day, folder, seconds, subtotal in cursor:
+        if subtotal:
+            folders.append((folder, seconds / 3600))
+            continue
+
+        __, hours = series.setdefault(task_id, (name, [0.0] * (count + 1)))
+        hours[(day - first).days] += seconds / 3600
+
+    if not series:
+        raise ValueError()
+
+    folders.sort(key=lambda folder: folder[1], reverse=True)
+    return first, list(series.values()), folders
+
+
+def footer(folders: list[tuple[str | None, float]]) -> str:
+    shown = folders[:TOP_FOLDERS]
+    rest = sum(hours for __, hours in folders[TOP_FOLDERS:])
+
+    parts = [
+        (name if name is not None else _('Main folder'), hours)
+        for name, hours in shown
+    ]
+    if rest:
+        parts.append((_('Other folders'), rest))
+
+    return '   '.join(_('%s: %.1f h') % part for part in parts)
+
+
+async def days_chart(account: Account, count: int) -> render.Chart:
+    first, series, folders = await chronology(account, count)
+    days = [first + timedelta(days=i) for i in range(count + 1)]
+
+    return render.Chart(
+        kind=render.DAYS,
+        title=_('Activity time'),
+        xlabel=_('Day'),
+        ylabel=_('Hours'),
+        series=[
+            (name if name is not None else _('Other tasks'), hours)
+            for name, hours in series
+        ],
+        labels=[str(date.day) for date in days],
+        legend=True,
+        footer=footer(folders)
+    )
+
+
+async def week(account: Account) -> bytes:
+    return await days(account, 6)
+
+
+async def month(account: Account) -> bytes:
+    return await days(account, 29)
+
+
+async def days(account: Account, count: int) -> bytes:
+    return await backend.produce(await days_chart(account, count))
@@ -0,0 +1,35 @@
+'''
+Backends turning the charts of the reports into the content sent to the
+user, selected by REPORT_BACKEND in settings.py. The "image" backend
+draws PNG images with matplotlib in the report pool, the "text" one
+writes Unicode bar charts in the bot process, so a small node serves
+the reports without loading matplotlib or starting the workers.
+'''
+
+import settings
+import repository
+
+from . import text
+from .pool import pool
+from .render import Chart
+
+
+IMAGE = 'image'
+TEXT = 'text'
+
+name = getattr(settings, 'REPORT_BACKEND', IMAGE)
+
+if name not in (IMAGE, TEXT):
+    raise ValueError(f'Unknown report backend {name!r}')
+
+
+async def produce(chart: Chart) -> bytes:
+    '''
+    Returns the PNG image of the chart, or its UTF-8 encoded text
+    '''
+    if name == TEXT:
+        return text.render(chart).encode()
+
+    # The data is read, the transaction is not held while drawing
+    await repository.commit()
+    return await pool.render(chart)
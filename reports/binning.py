@@ -0,0 +1,116 @@
+'''
+Distribution of the time records over the hours (or other equal parts)
+of a local day, computed with NumPy for all records at once. The dates
+are epoch seconds, the bins are bounded by the local wall clock, so on
+the days of the DST transitions some of them are longer or empty.
+
+The reports read the hours from the daily rollup kept by the database,
+benchmarks/rollup.py checks the rollup against this module.
+'''
+
+import numpy
+import pytz
+from datetime import date, datetime, time, timedelta
+
+
+def to_epoch(dates: list[datetime]) -> numpy.ndarray:
+    '''
+    Converts naive UTC dates, the way they are stored, to epoch seconds
+    '''
+    return numpy.array(dates, dtype='datetime64[s]').astype(numpy.int64)
+
+
+def boundary(timezone, moment: datetime) -> datetime:
+    '''
+    Localizes the wall clock time of a boundary, a repeated one is its
+    first occurrence and a skipped one is the moment the clock jumps
+    over it, so each bin holds the time shown with its hour
+    '''
+    try:
+        return timezone.localize(moment, is_dst=None)
+    except pytz.AmbiguousTimeError:
+        return timezone.localize(moment, is_dst=True)
+    except pytz.NonExistentTimeError:
+        return timezone.localize(moment, is_dst=False)
+
+
+def edges(day: date, timezone, length: int = 60) -> numpy.ndarray:
+    '''
+    Returns the epoch seconds of the boundaries of the bins of the given
+    length in minutes (a divisor of a day) in the local day, one more
+    than the number of the bins
+    '''
+    if (24 * 60) % length:
+        raise ValueError('The length of the bins must divide a day')
+
+    midnight = datetime.combine(day, time())
+    bounds = [
+        boundary(timezone, midnight + timedelta(minutes=offset))
+        for offset in range(0, 24 * 60, length)
+    ]
+    bounds.append(boundary(timezone, midnight + timedelta(days=1)))
+
+    return numpy.array(
+        [int(bound.astimezone(pytz.utc).timestamp()) for bound in bounds],
+        dtype=numpy.int64
+    )
+
+
+def coverage(
+    starts: numpy.ndarray, ends: numpy.ndarray, points: numpy.ndarray
+) -> numpy.ndarray:
+    '''
+    Returns the number of seconds covered by the ranges [start, end)
+    before each of the points, overlapping ranges are counted each.
+    Sum of (point - start) for the started ranges minus sum of
+    (point - end) for the ended ones, found with binary searches.
+    '''
+    starts = numpy.sort(starts)
+    ends = numpy.sort(ends)
+    zero = numpy.zeros(1, dtype=numpy.int64)
+
+    started = numpy.searchsorted(starts, points)
+    ended = numpy.searchsorted(ends, points)
+    start_sums = numpy.concatenate((zero, numpy.cumsum(starts)))
+    end_sums = numpy.concatenate((zero, numpy.cumsum(ends)))
+
+    return (
+        started * points - start_sums[started]
+        - (ended * points - end_sums[ended])
+    )
+
+
+def minutes(
+    starts: numpy.ndarray, ends: numpy.ndarray, edges: numpy.ndarray
+) -> numpy.ndarray:
+    '''
+    Returns the minutes of the ranges within each bin, the parts of the
+    ranges outside of the edges (e.g. before midnight) are not counted
+    '''
+    if not len(starts):
+        return numpy.zeros(len(edges) - 1)
+
+    return numpy.diff(coverage(starts, ends, edges)) / 60
+
+
+def timeline(
+    starts: list[datetime],
+    ends: list[datetime | None],
+    day: date,
+    timezone,
+    length: int = 60,
+    now: datetime | None = None
+) -> list[float]:
+    '''
+    Minutes of the records (naive UTC dates) within each hour, or each
+    part of the given length in minutes, of the local day. A record
+    without the end (e.g. the running period of a timer) lasts until
+    now, the current time by default.
+    '''
+    if now is None:
+        now = datetime.now(pytz.utc).replace(tzinfo=None)
+    ends = [now if end is None else end for end in ends]
+
+    return minutes(
+        to_epoch(starts), to_epoch(ends), edges(day, timezone, length)
+    ).tolist()
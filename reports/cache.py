@@ -0,0 +1,103 @@
+'''
+Cache of the report images. The keys contain the version of the data
+of the reports of the account (see models.COUNTER_TRIGGERS), so a
+cached image is never shown after the time records have changed, and
+the outdated entries are evicted as the least recently used ones.
+With REPORT_CACHE = 'redis' in settings.py the images are also shared
+between the processes through Redis.
+'''
+
+import settings
+from typing import NamedTuple
+from redis.asyncio import Redis
+from aiogram.utils.i18n import get_i18n
+
+from . import utils
+from . import backend
+from cache import LRUCache
+
+
+class Entry(NamedTuple):
+    # PNG image, or UTF-8 encoded text with the text backend
+    image: bytes
+    # Id of the photo uploaded to Telegram, which is sent instead of
+    # uploading the image again
+    file_id: str | None = None
+
+
+def key(subject: str, count: int, timezone: str, version: int) -> str:
+    '''
+    Builds the key of the report of the subject (e.g. "task:1") for the
+    given number of days before today in the time zone and the current
+    locale. Today is a part of the key, as the report depends on it,
+    and so is the backend, whose reports may be shared through Redis.
+    '''
+    first = utils.period(utils.get_timezone(timezone), count)[0]
+    locale = get_i18n().current_locale
+
+    return ':'.join(map(str, (
+        subject, count, first.isoformat(), locale, timezone, version,
+        backend.name
+    )))
+
+
+class ReportCache:
+    def __init__(
+        self,
+        memory: LRUCache,
+        redis: Redis | None = None,
+        prefix: str = 'report'
+    ) -> None:
+        self.memory = memory
+        self.redis = redis
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Entry | None:
+        entry = self.memory.get(key)
+
+        if entry is None and self.redis is not None:
+            image, file_id = await self.redis.hmget(
+                f'{self.prefix}:{key}', ['i', 'f']
+            )
+            if image is not None:
+                entry = Entry(image, file_id.decode() if file_id else None)
+                self.memory.set(key, entry)
+
+        return entry
+
+    async def set(self, key: str, entry: Entry):
+        self.memory.set(key, entry)
+
+        if self.redis is None:
+            return
+
+        name = f'{self.prefix}:{key}'
+        mapping: dict = {'i': entry.image}
+        if entry.file_id:
+            mapping['f'] = entry.file_id
+
+        async with self.redis.pipeline(transaction=False) as pipeline:
+            pipeline.hset(name, mapping=mapping)
+            pipeline.expire(name, int(self.memory.ttl))
+            await pipeline.execute()
+
+
+def create() -> ReportCache:
+    '''
+    Creates the cache according to settings.py file
+    '''
+    memory = LRUCache(
+        # Images of about a hundred kilobytes each
+        maxsize=getattr(settings, 'REPORT_CACHE_SIZE', 256),
+        ttl=getattr(settings, 'REPORT_CACHE_TTL', 24 * 60 * 60)
+    )
+
+    redis = None
+    if getattr(settings, 'REPORT_CACHE', 'memory') == 'redis':
+        url = getattr(settings, 'REPORT_CACHE_REDIS_URL', settings.BROKER)
+        redis = Redis.from_url(url)
+
+    return ReportCache(memory, redis)
+
+
+cache = create()
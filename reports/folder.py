@@ -1,138 +1,121 @@
 from . import utils
-from peewee import fn
-from typing import IO
-from datetime import timedelta
+from . import render
+from . import backend
+from datetime import date, timedelta
+from repository import threaded
 from aiogram.utils.i18n import gettext as _
-from models import database, Account, Folder, Task, Duration, utc_now
-
-
-def today(account: Account, folder: Folder | None, file: IO):
-    # The pyplot module from matplotlib has been
-    # imported to avoid errors when executing Celery tasks.
-    from matplotlib import pyplot
-
-    with database:
-        records = (
-            Task
-            .select(Task, Duration)
-            .join(Duration)
-            .where(
-                Task.account == account,
-                Task.folder == folder,
-                Task.is_done == False,  # noqa
-                fn.DATE(Duration.start) == utc_now().date()
-            )
-            .order_by(Duration.start)
-            .limit(500)
+from models import Account, Folder, Task, DailyRollup
+
+
+Series = list[tuple[str, list[float]]]
+
+
+@threaded
+def timelines(account: Account, folder: Folder | None) -> Series:
+    '''
+    Returns the minutes of activity of each hour of today by task,
+    ValueError is raised if there are no time records
+    '''
+    timezone = utils.get_timezone(account.timezone)
+    today = utils.period(timezone, 0)[0]
+
+    records = (
+        DailyRollup
+        .select(Task.name, DailyRollup.hours)
+        .join(Task)
+        .where(
+            Task.account == account,
+            Task.folder == folder,
+            Task.is_done == False,  # noqa
+            DailyRollup.day == today
         )
-        if not len(records):
-            raise ValueError()
-
-    timelines = {}
-
-    for task in records:
-        if task not in timelines:
-            timelines[task] = [0] * 24
-
-        utils.add_time(timelines[task], task.duration)
-
-    hours = list(range(24))
-    last_timeline = [0] * 24
-
-    pyplot.close('all')
-    pyplot.figure(0, (5, 3), 300)
-    pyplot.style.use('seaborn-v0_8-dark')
-
-    for task, timeline in timelines.items():
-        pyplot.bar(hours, timeline, bottom=last_timeline, label=task.name)
-        last_timeline = timeline
-
-    pyplot.title(_('Activity time'))
-    pyplot.xlabel(_('Hour'), fontsize='xx-small')
-    pyplot.ylabel(_('Minute'), fontsize='xx-small')
-    pyplot.xticks(hours, fontsize='xx-small')
-    pyplot.yticks(range(0, 61, 10), fontsize='xx-small')
-    pyplot.xlim(0, 23)
-    pyplot.ylim(0, 65 + len(timelines)*5)
-    pyplot.legend(
-        loc='upper left',
-        fancybox=True,
-        shadow=True,
-        fontsize='xx-small'
+        .order_by(Task.id)
+        .tuples()
+    )
+    if not len(records):
+        raise ValueError()
+
+    return [
+        (name, [seconds / 60 for seconds in hours])
+        for name, hours in records
+    ]
+
+
+@threaded
+def chronology(
+    account: Account, folder: Folder | None, count: int
+) -> tuple[date, Series]:
+    '''
+    Returns the first day of the period and the hours of activity of each
+    day by task, ValueError is raised if there are no time records
+    '''
+    timezone = utils.get_timezone(account.timezone)
+    first = utils.period(timezone, count)[0]
+    chronology: dict[int, tuple[str, list[float]]] = {}
+
+    records = (
+        DailyRollup
+        .select(Task.id, Task.name, DailyRollup.day, DailyRollup.seconds)
+        .join(Task)
+        .where(
+            Task.account == account,
+            Task.folder == folder,
+            DailyRollup.day.between(first, first + timedelta(days=count))
+        )
+        .order_by(DailyRollup.day)
+        .tuples()
+    )
+    if not len(records):
+        raise ValueError()
+
+    for id, name, day, seconds in records:
+        __, hours = chronology.setdefault(id, (name, [0.0] * (count + 1)))
+        hours[(day - first).days] += seconds / 3600
+
+    return first, list(chronology.values())
+
+
+async def today_chart(
+    account: Account, folder: Folder | None
+) -> render.Chart:
+    return render.Chart(
+        kind=render.HOURS,
+        title=_('Activity time'),
+        xlabel=_('Hour'),
+        ylabel=_('Minute'),
+        series=await timelines(account, folder),
+        legend=True
     )
-
-    pyplot.savefig(file, format='png')
-    pyplot.close('all')
 
 
-def week(account: Account, folder: Folder | None, file: IO):
-    return days(account, folder, 6, file)
+async def days_chart(
+    account: Account, folder: Folder | None, count: int
+) -> render.Chart:
+    first, series = await chronology(account, folder, count)
+    days = [first + timedelta(days=i) for i in range(count + 1)]
+
+    return render.Chart(
+        kind=render.DAYS,
+        title=_('Activity time'),
+        xlabel=_('Day'),
+        ylabel=_('Hours'),
+        series=series,
+        labels=[str(date.day) for date in days],
+        legend=True
+    )
 
 
-def month(account: Account, folder: Folder | None, file: IO):
-    return days(account, folder, 29, file)
+async def today(account: Account, folder: Folder | None) -> bytes:
+    return await backend.produce(await today_chart(account, folder))
 
 
-def days(account: Account, folder: Folder | None, count: int, file: IO):
-    # The pyplot module from matplotlib has been
-    # imported to avoid errors when executing Celery tasks.
-    from matplotlib import pyplot
+async def week(account: Account, folder: Folder | None) -> bytes:
+    return await days(account, folder, 6)
 
-    now = utc_now().date()
-    startswith = now - timedelta(days=count)
-    days = [now - timedelta(days=i) for i in range(count, -1, -1)]
-    chronology = {}
 
-    date = fn.DATE(Duration.start)
-    duration = fn.SUM(Duration.end - Duration.start).alias('duration')
+async def month(account: Account, folder: Folder | None) -> bytes:
+    return await days(account, folder, 29)
 
-    with database:
-        records = (
-            Task
-            .select(Task, date, duration)
-            .join(Duration)
-            .where(
-                Task.account == account,
-                Task.folder == folder,
-                date >= startswith
-            )
-            .group_by(Task, date)
-            .order_by(date)
-        )
-        if not len(records):
-            raise ValueError()
-
-    for task in records:
-        if task not in chronology:
-            chronology[task] = [0] * (count + 1)
-
-        chronology[task][days.index(task.date)] += \
-            utils.minutes(task.duration) / 60
-
-    length = len(chronology)
-    days = [str(date.day) for date in days]
-    last_hours = [0] * (count+1)
-
-    pyplot.close('all')
-    pyplot.figure(0, (4 + length//4, 2 + length//3), 300)
-    pyplot.style.use('seaborn-v0_8-dark')
-
-    for task, hours in chronology.items():
-        pyplot.bar(range(count + 1), hours, bottom=last_hours, label=task.name)
-        last_hours = hours
-
-    pyplot.title(_('Activity time'))
-    pyplot.xlabel(_('Day'), fontsize='xx-small')
-    pyplot.ylabel(_('Hours'), fontsize='xx-small')
-    pyplot.xticks(range(count + 1), labels=days, fontsize='xx-small')
-    pyplot.yticks(range(15), fontsize='xx-small')
-    pyplot.ylim(0, 15 + length//2)
-    pyplot.legend(
-        loc='upper left',
-        fancybox=True,
-        shadow=True,
-        fontsize='xx-small'
-    )
 
-    pyplot.savefig(file, format='png')
-    pyplot.close('all')
+async def days(account: Account, folder: Folder | None, count: int) -> bytes:
+    return await backend.produce(await days_chart(account, folder, count))
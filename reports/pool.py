@@ -0,0 +1,170 @@
+'''
+Report rendering service. Rendering a figure takes hundreds of
+milliseconds of CPU, so the charts are drawn in a pool of worker
+processes started in advance with matplotlib already imported, and the
+handlers await the PNG images without blocking the event loop.
+'''
+
+import asyncio
+import logging
+import settings
+import multiprocessing
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import render
+
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    '''
+    Raised instead of queueing a report when the queue of the pool is full
+    '''
+
+
+class RenderPool:
+    '''
+    Process pool with a bounded number of reports waiting for a free
+    worker. A pool broken by a worker that died (e.g. killed for its
+    memory) is replaced with a new one. The numbers of rendered and
+    rejected reports and of the restarts, the depth of the queue and the
+    render times are kept for monitoring.
+    '''
+
+    def __init__(
+        self,
+        workers: int = 2,
+        queue_size: int = 8,
+        budget: int | None = None
+    ) -> None:
+        self.workers = workers
+        self.queue_size = queue_size
+        # Maximum size of an image in bytes, larger ones are drawn
+        # again with a lower resolution
+        self.budget = budget
+        self.executor: ProcessPoolExecutor | None = None
+
+        self.pending = 0
+        self.rendered = 0
+        self.rejected = 0
+        self.restarts = 0
+        # Seconds spent on drawing in the workers and waiting in total
+        self.render_time = 0.0
+        self.max_render_time = 0.0
+        self.wait_time = 0.0
+
+    async def start(self):
+        '''
+        Starts all the workers, so that the first reports
+        do not pay for the start of a process and the imports
+        '''
+        if self.executor is not None:
+            return
+
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            # Forking a process with running threads is not safe
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=render.warm_up
+        )
+        loop = asyncio.get_running_loop()
+
+        # Each simultaneous call starts one more worker
+        await asyncio.gather(*(
+            loop.run_in_executor(self.executor, render.ping)
+            for _ in range(self.workers)
+        ))
+
+    async def draw(self, chart: render.Chart) -> tuple[bytes, float]:
+        '''
+        Draws the chart in a worker, a broken pool is shut down
+        and BrokenProcessPool is raised, the next call starts a new one
+        '''
+        if self.executor is None:
+            await self.start()
+
+        executor = self.executor
+        loop = asyncio.get_running_loop()
+
+        try:
+            return await loop.run_in_executor(
+                executor, render.timed, chart, self.budget
+            )
+        except BrokenProcessPool:
+            # The other reports of the broken pool fail at the same time,
+            # the first of them replaces it
+            if self.executor is executor:
+                logger.warning('Report pool is broken, restarting it')
+                await self.close()
+                self.restarts += 1
+            raise
+
+    async def render(self, chart: render.Chart) -> bytes:
+        '''
+        Returns the chart drawn as a PNG image, Overloaded is raised
+        if the queue is full or the chart breaks the pool twice
+        '''
+        if self.pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise Overloaded()
+
+        started_at = perf_counter()
+        self.pending += 1
+
+        try:
+            try:
+                image, elapsed = await self.draw(chart)
+            except BrokenProcessPool:
+                # The report may have been lost with a worker killed by
+                # another one, it is drawn once more by the new pool
+                image, elapsed = await self.draw(chart)
+        except BrokenProcessPool:
+            self.rejected += 1
+            raise Overloaded()
+        finally:
+            self.pending -= 1
+
+        waited = perf_counter() - started_at
+        self.rendered += 1
+        self.render_time += elapsed
+        self.max_render_time = max(self.max_render_time, elapsed)
+        self.wait_time += waited
+
+        logger.debug(
+            'Report rendered in %.3f s (%.3f s with the queue), '
+            '%d more pending', elapsed, waited, self.pending
+        )
+        return image
+
+    @property
+    def queued(self) -> int:
+        return max(self.pending - self.workers, 0)
+
+    async def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'workers': self.workers,
+            'pending': self.pending,
+            'queued': self.queued,
+            'rendered': self.rendered,
+            'rejected': self.rejected,
+            'restarts': self.restarts,
+            'render_time': self.render_time,
+            'max_render_time': self.max_render_time,
+            'wait_time': self.wait_time,
+        }
+
+
+pool = RenderPool(
+    workers=getattr(settings, 'REPORT_WORKERS', 2),
+    # Reports waiting for a free worker, the others are rejected
+    queue_size=getattr(settings, 'REPORT_QUEUE_SIZE', 8),
+    budget=getattr(settings, 'REPORT_MAX_SIZE', None)
+)
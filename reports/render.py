@@ -0,0 +1,225 @@
+'''
+Drawing of the reports, executed in the worker processes of the report
+pool. The bot process builds a Chart with the data and the translated
+texts, so the workers neither query the database nor need the locale.
+
+The figures are drawn with the object-oriented API of matplotlib on the
+Agg canvas, without the global state of pyplot. The style is applied
+once per process, and a styled figure is kept for each kind of chart,
+so that a report only replaces the bars and the texts on it.
+'''
+
+import io
+import math
+import threading
+from time import perf_counter
+from dataclasses import dataclass, field
+
+
+# Kinds of charts
+HOURS = 'hours'
+DAYS = 'days'
+
+STYLE = 'seaborn-v0_8-dark'
+DPI = 300
+# The resolution is not lowered below it to fit an image into a budget
+MIN_DPI = 72
+
+
+@dataclass
+class Chart:
+    kind: str
+    title: str
+    xlabel: str
+    ylabel: str
+    # Names of the tasks with the values of their bars, stacked if there
+    # are several of them. Minutes of each hour or hours of each day.
+    series: list[tuple[str, list[float]]]
+    # Labels of the days
+    labels: list[str] = field(default_factory=list)
+    legend: bool = False
+    # Line of text under the chart, e.g. the totals of the folders
+    footer: str = ''
+
+    def size(self) -> tuple[float, float]:
+        '''
+        Size of the figure in inches, the legend takes a place
+        '''
+        length = len(self.series)
+
+        if self.kind == HOURS:
+            return 5, 3 if self.legend else 2.5
+        if self.legend:
+            return 4 + length//4, 2 + length//3
+        return 5, 2.5
+
+
+class Template:
+    '''
+    Figure of a kind of charts with the given number of bars in a series.
+    The axes, the ticks and the fonts are set up once, and the bars of
+    the previous chart are reused for the next one.
+    '''
+
+    def __init__(self, kind: str, size: int, legend: bool) -> None:
+        from matplotlib import rcParams
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        self.kind = kind
+        self.legend = legend
+        self.positions = range(size)
+        self.colors = rcParams['axes.prop_cycle'].by_key()['color']
+        self.bars: list = []
+
+        # Reused for the images of all charts drawn on the figure
+        self.buffer = io.BytesIO()
+        self.figure = Figure(dpi=DPI)
+        FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot()
+        self.axes.tick_params(labelsize='xx-small')
+        self.bottom = self.figure.subplotpars.bottom
+        self.footer = self.figure.text(
+            0.5, 0.02, '', ha='center', va='bottom', fontsize='xx-small'
+        )
+
+        if kind == HOURS:
+            self.axes.set_xticks(self.positions)
+            self.axes.set_yticks(range(0, 61, 10))
+            self.axes.set_xlim(0, 23)
+        else:
+            self.axes.set_xticks(self.positions)
+
+    def stack(self, series: list[tuple[str, list[float]]]):
+        '''
+        Updates the heights and bottoms of the existing bars,
+        adds the missing series and removes the extra ones
+        '''
+        bottom = [0.0] * len(self.positions)
+
+        for index, (name, values) in enumerate(series):
+            if index < len(self.bars):
+                bars = self.bars[index]
+                for bar, value, base in zip(bars, values, bottom):
+                    bar.set_y(base)
+                    bar.set_height(value)
+            else:
+                bars = self.axes.bar(
+                    self.positions,
+                    values,
+                    bottom=bottom,
+                    color=self.colors[index % len(self.colors)]
+                )
+                self.bars.append(bars)
+
+            bars.set_label(name)
+            bottom = [total + value for total, value in zip(bottom, values)]
+
+        for bars in self.bars[len(series):]:
+            bars.remove()
+        del self.bars[len(series):]
+
+    def save(self, dpi: int) -> bytes:
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.figure.savefig(self.buffer, format='png', dpi=dpi)
+        return self.buffer.getvalue()
+
+    def draw(self, chart: Chart, budget: int | None = None) -> bytes:
+        '''
+        Returns the chart as a PNG image, saved again with a lower
+        resolution if it is larger than the budget in bytes
+        '''
+        length = len(chart.series)
+        axes = self.axes
+
+        self.figure.set_size_inches(chart.size())
+        self.stack(chart.series)
+
+        self.footer.set_text(chart.footer)
+        self.figure.subplots_adjust(
+            bottom=self.bottom + 0.08 if chart.footer else self.bottom
+        )
+
+        axes.set_title(chart.title)
+        axes.set_xlabel(chart.xlabel, fontsize='xx-small')
+        axes.set_ylabel(chart.ylabel, fontsize='xx-small')
+
+        if self.kind == HOURS:
+            axes.set_ylim(0, 65 + length*5 if self.legend else 60)
+        else:
+            axes.set_xticks(self.positions, labels=chart.labels)
+            axes.relim()
+            axes.autoscale_view()
+            if self.legend:
+                # The days of the account-wide report may exceed 15 hours
+                columns = zip(*(values for __, values in chart.series))
+                peak = max(map(sum, columns), default=0)
+                top = max(15, math.ceil(peak))
+                axes.set_yticks(range(top))
+                axes.set_ylim(0, top + length//2)
+
+        if self.legend:
+            axes.legend(
+                loc='upper left',
+                fancybox=True,
+                shadow=True,
+                fontsize='xx-small'
+            )
+
+        dpi = DPI
+        while True:
+            image = self.save(dpi)
+            if budget is None or len(image) <= budget or dpi <= MIN_DPI:
+                return image
+
+            # The size of the image is roughly proportional to its area
+            scale = (budget / len(image)) ** 0.5 * 0.9
+            dpi = max(int(dpi * scale), MIN_DPI)
+
+
+# Templates of the current thread by kind, number of bars and legend,
+# a figure must not be drawn by two threads at once
+local = threading.local()
+
+
+def template(chart: Chart) -> Template:
+    templates = getattr(local, 'templates', None)
+    if templates is None:
+        templates = local.templates = {}
+
+    key = (chart.kind, len(chart.series[0][1]), chart.legend)
+    if key not in templates:
+        templates[key] = Template(*key)
+
+    return templates[key]
+
+
+def warm_up():
+    '''
+    Initializer of the worker processes, imports matplotlib, applies
+    the style and loads the fonts by drawing an empty chart
+    '''
+    from matplotlib import style
+    style.use(STYLE)
+
+    render(Chart(HOURS, '', '', '', [('', [0.0] * 24)]))
+
+
+def ping() -> bool:
+    return True
+
+
+def render(chart: Chart, budget: int | None = None) -> bytes:
+    return template(chart).draw(chart, budget)
+
+
+def timed(
+    chart: Chart, budget: int | None = None
+) -> tuple[bytes, float]:
+    '''
+    Renders the chart and returns the PNG image with the time it took
+    '''
+    started_at = perf_counter()
+    image = render(chart, budget)
+    return image, perf_counter() - started_at
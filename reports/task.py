@@ -1,112 +1,94 @@
-from typing import IO
 from . import utils
-from peewee import fn
-# from matplotlib import pyplot
-from datetime import timedelta
-from models import database, Task, Duration, utc_now
+from . import render
+from . import backend
+from datetime import date, timedelta
+from models import Task, DailyRollup
+from repository import threaded
 from aiogram.utils.i18n import gettext as _
 
 
-def today(task: Task, file: IO):
-    # The pyplot module from matplotlib has been
-    # imported to avoid errors when executing Celery tasks.
+@threaded
+def timeline(task: Task) -> list[float]:
+    '''
+    Returns the minutes of activity of each hour of today,
+    ValueError is raised if there are no time records
+    '''
+    timezone = utils.get_timezone(task.account.timezone)
+    today = utils.period(timezone, 0)[0]
 
-    # > billiard.exceptions.WorkerLostError:
-    # >Worker exited prematurely: signal 6 (SIGABRT) Job: 1
+    rollup = DailyRollup.get_or_none(
+        DailyRollup.task == task, DailyRollup.day == today
+    )
+    if rollup is None:
+        raise ValueError()
 
-    from matplotlib import pyplot
+    return [seconds / 60 for seconds in rollup.hours]
 
-    now = utc_now().date()
 
-    with database:
-        durations = (
-            Duration
-            .select()
-            .where(
-                Duration.task == task,
-                fn.DATE(Duration.start) >= now
-            )
-            .order_by(Duration.start)
-            .limit(500)
-        )
-        if not len(durations):
-            raise ValueError()
-
-    timeline = [0] * 24
-
-    for duration in durations:
-        utils.add_time(timeline, duration)
-
-    hours = list(range(24))
-
-    pyplot.close('all')
-    pyplot.figure(0, (5, 2.5), 300)
-    pyplot.style.use('seaborn-v0_8-dark')
+@threaded
+def chronology(task: Task, count: int) -> tuple[date, list[float]]:
+    '''
+    Returns the first day of the period and the hours of activity of each
+    day, ValueError is raised if there are no time records
+    '''
+    hours = [0.0] * (count + 1)
 
-    pyplot.title(_('Activity time'))
-    pyplot.xlabel(_('Hour'), fontsize='xx-small')
-    pyplot.ylabel(_('Minute'), fontsize='xx-small')
-    pyplot.xticks(hours, fontsize='xx-small')
-    pyplot.yticks(range(0, 61, 10), fontsize='xx-small')
-    pyplot.xlim(0, 23)
-    pyplot.ylim(0, 60)
-    pyplot.bar(hours, timeline)
+    timezone = utils.get_timezone(task.account.timezone)
+    first = utils.period(timezone, count)[0]
 
-    pyplot.savefig(file, format='png')
-    pyplot.close('all')
+    records = (
+        DailyRollup
+        .select(DailyRollup.day, DailyRollup.seconds)
+        .where(
+            DailyRollup.task == task,
+            DailyRollup.day.between(first, first + timedelta(days=count))
+        )
+        .tuples()
+    )
+    if not len(records):
+        raise ValueError()
 
+    for day, seconds in records:
+        hours[(day - first).days] += seconds / 3600
 
-def week(task: Task, file: IO):
-    return days(task, 6, file)
+    return first, hours
 
 
-def month(task: Task, file: IO):
-    return days(task, 29, file)
+async def today_chart(task: Task) -> render.Chart:
+    return render.Chart(
+        kind=render.HOURS,
+        title=_('Activity time'),
+        xlabel=_('Hour'),
+        ylabel=_('Minute'),
+        series=[(task.name, await timeline(task))]
+    )
 
 
-def days(task: Task, count: int, file: IO):
-    # The pyplot module from matplotlib has been
-    # imported to avoid errors when executing Celery tasks.
-    from matplotlib import pyplot
+async def days_chart(task: Task, count: int) -> render.Chart:
+    first, hours = await chronology(task, count)
+    days = [first + timedelta(days=i) for i in range(count + 1)]
 
-    date = fn.DATE(Duration.start)
-    duration = fn.SUM(Duration.end - Duration.start).alias('duration')
+    return render.Chart(
+        kind=render.DAYS,
+        title=_('Activity time'),
+        xlabel=_('Day'),
+        ylabel=_('Hours'),
+        series=[(task.name, hours)],
+        labels=[str(date.day) for date in days]
+    )
 
-    now = utc_now().date()
-    startswith = now - timedelta(days=count)
 
-    days = [now - timedelta(days=i) for i in range(count, -1, -1)]
-    hours = [0.0] * (count + 1)
+async def today(task: Task) -> bytes:
+    return await backend.produce(await today_chart(task))
 
-    with database:
-        records = (
-            Duration
-            .select(date.alias('date'), duration)
-            .where(
-                Duration.task == task,
-                date >= startswith
-            )
-            .group_by(date)
-            .order_by(date)
-            .limit(500)
-        )
-        if not len(records):
-            raise ValueError()
 
-    for record in records:
-        hours[days.index(record.date)] += utils.minutes(record.duration) / 60
+async def week(task: Task) -> bytes:
+    return await days(task, 6)
 
-    days = [str(date.day) for date in days]
 
-    pyplot.close('all')
-    pyplot.figure(0, (5, 2.5), 300)
-    pyplot.style.use('seaborn-v0_8-dark')
+async def month(task: Task) -> bytes:
+    return await days(task, 29)
 
-    pyplot.title(_('Activity time'))
-    pyplot.xlabel(_('Day'), fontsize='xx-small')
-    pyplot.ylabel(_('Hours'), fontsize='xx-small')
-    pyplot.xticks(range(count+1), labels=days, fontsize='xx-small')
-    pyplot.bar(range(count+1), hours)
 
-    pyplot.savefig(file, format='png')
-    pyplot.close('all')
+async def days(task: Task, count: int) -> bytes:
+    return await backend.produce(await days_chart(task, count))
@@ -0,0 +1,105 @@
+'''
+Drawing of the reports as Unicode bar charts, sent as a monospaced
+message. It needs neither matplotlib nor the worker processes, the
+horizontal bars are the hours or the days of the chart.
+'''
+
+from .render import Chart, HOURS
+
+
+# Characters of the longest bar
+WIDTH = 20
+# Eighths of a character for the bars of a single series
+BLOCKS = ' ▏▎▍▌▋▊▉█'
+# Fills of the stacked series, repeated if there are more of them
+FILLS = '█▓▒░▚▞▤▥'
+NAME_LENGTH = 24
+# A message of Telegram is limited to 4096 characters counted in UTF-16
+# code units, the report is cut to the place left by its caption
+MAX_LENGTH = 4096
+
+
+def length(text: str) -> int:
+    '''
+    Length of the text as counted by Telegram
+    '''
+    return len(text.encode('utf-16-le')) // 2
+
+
+def fit(text: str, limit: int) -> str:
+    '''
+    Cuts the text to the given length as counted by Telegram,
+    the end of a cut text is replaced with an ellipsis
+    '''
+    if length(text) <= limit:
+        return text
+
+    encoded = text.encode('utf-16-le')[:max(limit - 1, 0) * 2]
+    # Half of a surrogate pair may be left at the end
+    return encoded.decode('utf-16-le', errors='ignore') + '…'
+
+
+def shorten(name: str) -> str:
+    if len(name) <= NAME_LENGTH:
+        return name
+    return name[:NAME_LENGTH - 1] + '…'
+
+
+def bar(value: float, scale: float) -> str:
+    eighths = round(value / scale * WIDTH * 8)
+    full, rest = divmod(eighths, 8)
+    return (BLOCKS[-1] * full + (BLOCKS[rest] if rest else '')).ljust(WIDTH)
+
+
+def stacked(values: list[float], scale: float) -> str:
+    '''
+    Bar of the values of several series, each of them filled with its
+    character. The ends of the parts are rounded, not their lengths,
+    so that the length of the bar matches the total.
+    '''
+    cells, total, end = '', 0.0, 0
+
+    for index, value in enumerate(values):
+        total += value
+        start, end = end, round(total / scale * WIDTH)
+        cells += FILLS[index % len(FILLS)] * (end - start)
+
+    return cells.ljust(WIDTH)
+
+
+def render(chart: Chart) -> str:
+    columns = list(zip(*(values for __, values in chart.series)))
+    totals = [sum(column) for column in columns]
+
+    if chart.kind == HOURS:
+        labels = [f'{hour:02}' for hour in range(len(columns))]
+        amounts = [f'{round(total)}' for total in totals]
+        # As on the image, the scale is an hour unless it is exceeded
+        scale = max(60.0, *totals)
+    else:
+        labels = chart.labels
+        amounts = [f'{total:.1f}' for total in totals]
+        scale = max(totals) or 1.0
+
+    lines = [chart.title]
+    if len(chart.series) == 1:
+        lines.append(shorten(chart.series[0][0]))
+    else:
+        lines.extend(
+            f'{FILLS[index % len(FILLS)]} {shorten(name)}'
+            for index, (name, __) in enumerate(chart.series)
+        )
+    if chart.footer:
+        lines.append(chart.footer)
+    lines.append(f'{chart.xlabel} / {chart.ylabel}')
+
+    width = max(map(len, labels), default=0)
+    for label, column, amount in zip(labels, columns, amounts):
+        if len(chart.series) == 1:
+            drawn = bar(column[0], scale)
+        else:
+            drawn = stacked(list(column), scale)
+
+        lines.append(f'{label:>{width}} {drawn} {amount}')
+
+    return fit('\n'.join(lines), MAX_LENGTH)
@@ -1,36 +1,34 @@
-from datetime import timedelta
-from models import Duration
+import pytz
+from datetime import datetime, date, time, timedelta
+from models import utc_now
 
 
-def minutes(delta: timedelta) -> int:
-    return int(delta.total_seconds() // 60)
+def get_timezone(name: str):
+    try:
+        return pytz.timezone(name)
+    except pytz.exceptions.UnknownTimeZoneError:
+        return pytz.utc
 
 
-def add_time(timeline: list[int], duration: Duration):
-    hour = duration.start.hour
+def to_utc(timezone, day: date) -> datetime:
+    '''
+    Returns the local midnight of the day as a naive UTC datetime,
+    the way the dates are stored, so that it can be compared with
+    the columns directly
+    '''
+    midnight = timezone.localize(datetime.combine(day, time()))
+    return midnight.astimezone(pytz.utc).replace(tzinfo=None)
 
-    if hour == duration.end.hour:
-        timeline[hour] += minutes(duration.value)
-        return
 
-    following = duration.start \
-        .replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
-    timeline[hour] = minutes(following - duration.start)
+def period(timezone, count: int) -> tuple[date, datetime, datetime]:
+    '''
+    Returns the first day of the period consisting of the given number of
+    days before today and today itself in the time zone, and the half-open
+    range [lower, upper) of the period to filter the dates of the records
+    '''
+    today = utc_now().astimezone(timezone).date()
+    first = today - timedelta(days=count)
 
-    # Next day
-    if following.hour == 0:
-        return
+    return first, to_utc(timezone, first), \
+        to_utc(timezone, today + timedelta(days=1))
 
-    hour += 1
-    remainder = minutes(duration.end - following)
-
-    while remainder >= 60:
-        timeline[hour] += 60
-
-        remainder -= 60
-        hour += 1
-        if hour > 23:
-            return
-
-    if hour < 24:
-        timeline[hour] += remainder
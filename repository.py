@@ -0,0 +1,785 @@
+'''
+Asynchronous data access layer. Peewee is synchronous, so every function
+of the module is executed on a bounded thread pool, where each worker
+thread takes its own connection from the pool for the duration of a call.
+It keeps the event loop free to process other updates while the database
+is slow.
+'''
+
+import asyncio
+import threading
+import settings
+from functools import partial, wraps
+from datetime import datetime
+from contextvars import ContextVar, copy_context
+from typing import Awaitable, Callable, ParamSpec, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import LRUCache
+from aiogram.utils.i18n import gettext as _
+from peewee import fn, Field, JOIN, ModelSelect, SQL, Tuple
+from models import (
+    database, utc_now, Account, Counter, Folder, Task, Duration, Timer
+)
+
+
+P = ParamSpec('P')
+R = TypeVar('R')
+
+# Should not exceed the size of the connection pool
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'DB_THREADS', 10),
+    thread_name_prefix='database'
+)
+# Sessions are finished by threads of their own: the workers of the
+# executor may all be waiting for a free connection, and finishing is
+# what returns the connections to the pool
+finisher = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'DB_THREADS', 10),
+    thread_name_prefix='database-finish'
+)
+
+
+class Session:
+    '''
+    Unit of work: all calls made while the session is active share one
+    connection and one transaction, which is opened by the first call
+    and completed by finish. A finished session opens a new transaction
+    on its next call. Methods are executed in the worker threads.
+    '''
+
+    def __init__(self) -> None:
+        self.connection = None
+        self.calls = 0
+        self.queries = 0
+        # Called after the transaction is committed, see on_commit
+        self.callbacks: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def run(self, function: Callable[P, R], *args: P.args,
+            **kwargs: P.kwargs) -> R:
+        with self._lock:
+            if self.connection is None:
+                # Waits up to the timeout of the pool for a free connection
+                database.connect()
+                self.connection = database._state.conn
+                self.connection.autocommit = False
+
+            state = database._state
+            state.set_connection(self.connection)
+            # Nested atomic blocks become savepoints of the transaction
+            database.push_transaction(self)
+            state.queries = 0
+            running.session = self
+
+            try:
+                return function(*args, **kwargs)
+            finally:
+                running.session = None
+                self.calls += 1
+                self.queries += state.queries
+                # Detaches the connection from the thread without closing it
+                state.reset()
+
+    def finish(self, commit: bool = True):
+        '''
+        Commits (or rolls back) the transaction and returns the connection
+        to the pool, then calls the callbacks of a committed transaction
+        '''
+        with self._lock:
+            connection, self.connection = self.connection, None
+            callbacks, self.callbacks = self.callbacks, []
+            if connection is None:
+                return
+
+            try:
+                if commit:
+                    connection.commit()
+                else:
+                    connection.rollback()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                connection.autocommit = True
+                with database._lock:
+                    database._close(connection)
+
+        if commit:
+            for callback in callbacks:
+                callback()
+
+
+session: ContextVar[Session | None] = ContextVar('session', default=None)
+# Session whose call is running in the thread
+running = threading.local()
+
+
+def on_commit(callback: Callable[[], None]):
+    '''
+    Schedules the callback to be called once the transaction of the
+    running call is committed, it is dropped if the transaction is
+    rolled back. Must be called from a function executed in a session.
+    '''
+    running.session.callbacks.append(callback)
+
+
+def execute(
+    current: Session | None,
+    function: Callable[P, R],
+    *args: P.args,
+    **kwargs: P.kwargs
+) -> R:
+    if current is not None:
+        return current.run(function, *args, **kwargs)
+
+    # Outside of an update the call is a session of its own
+    current = Session()
+    try:
+        result = current.run(function, *args, **kwargs)
+    except BaseException:
+        current.finish(commit=False)
+        raise
+
+    current.finish()
+    return result
+
+
+def threaded(function: Callable[P, R]) -> Callable[P, Awaitable[R]]:
+    '''
+    Turns a synchronous function working with the database
+    into a coroutine function executed in the thread pool
+    within the current session, if there is one
+    '''
+
+    @wraps(function)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        loop = asyncio.get_running_loop()
+        call = partial(execute, session.get(), function, *args, **kwargs)
+        # The executor does not pass the context variables to the thread,
+        # the locale of the update is needed for the messages of errors
+        context = copy_context()
+        return await loop.run_in_executor(executor, context.run, call)
+
+    return wrapper
+
+
+async def finish(current: Session, commit: bool = True):
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(finisher, current.finish, commit)
+
+
+async def commit():
+    '''
+    Commits the transaction of the current session and returns its
+    connection to the pool, so that neither is held while waiting for
+    something else than the database, e.g. Telegram or the report pool
+    '''
+    current = session.get()
+    if current is not None and current.connection is not None:
+        await finish(current)
+
+
+# Account
+
+class AccountSnapshot:
+    '''
+    Compact copy of the account row together with the name of its active
+    folder, which is stored in the cache instead of the model instance
+    '''
+
+    __slots__ = (
+        'id', 'active_folder_id', 'active_folder_name',
+        'timezone', 'language_code'
+    )
+
+    def __init__(
+        self,
+        id: int,
+        active_folder_id: int | None,
+        active_folder_name: str | None,
+        timezone: str,
+        language_code: str
+    ) -> None:
+        self.id = id
+        self.active_folder_id = active_folder_id
+        self.active_folder_name = active_folder_name
+        self.timezone = timezone
+        self.language_code = language_code
+
+    def to_model(self) -> Account:
+        '''
+        Builds an Account instance without querying the database
+        '''
+        folder = None
+        if self.active_folder_id is not None:
+            folder = Folder(
+                id=self.active_folder_id,
+                name=self.active_folder_name,
+                account=self.id
+            )
+
+        return Account(
+            id=self.id,
+            active_folder=folder,
+            timezone=self.timezone,
+            language_code=self.language_code
+        )
+
+
+accounts = LRUCache(
+    maxsize=getattr(settings, 'ACCOUNT_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'ACCOUNT_CACHE_TTL', 300)
+)
+
+ACCOUNT_SELECT = '''
+SELECT account.id, account.active_folder_id, folder.name,
+       account.timezone, account.language_code
+FROM account
+LEFT JOIN folder ON folder.id = account.active_folder_id
+WHERE account.id = %s
+'''
+
+# Either inserts the account and returns it, or returns the existing one
+# with the name of its active folder. Both parts of the query see the
+# same snapshot, so at most one row is returned. None is returned if a
+# concurrent transaction inserted the account after the snapshot was
+# taken: the insertion waits for it to commit and then does nothing.
+ACCOUNT_UPSERT = '''
+WITH inserted AS (
+    INSERT INTO account (id, timezone, language_code)
+    VALUES (%s, %s, %s)
+    ON CONFLICT (id) DO NOTHING
+    RETURNING id, active_folder_id, timezone, language_code
+)
+SELECT id, active_folder_id, NULL::varchar, timezone, language_code
+FROM inserted
+UNION ALL
+''' + ACCOUNT_SELECT
+
+
+@threaded
+def upsert_account(id: int, language_code: str) -> AccountSnapshot:
+    timezone = Account.timezone.default
+    cursor = database.execute_sql(
+        ACCOUNT_UPSERT, (id, timezone, language_code, id)
+    )
+    row = cursor.fetchone()
+
+    if row is None:
+        # A new statement sees the account inserted concurrently
+        row = database.execute_sql(ACCOUNT_SELECT, (id,)).fetchone()
+
+    snapshot = AccountSnapshot(*row)
+    # Other updates must not see an account that may still be rolled back
+    on_commit(partial(accounts.set, id, snapshot))
+    return snapshot
+
+
+async def get_or_create_account(id: int, language_code: str) -> Account:
+    '''
+    Returns the account from the cache, on a miss the
+    account is created or fetched with a single query
+    '''
+    snapshot = accounts.get(id)
+
+    if snapshot is None:
+        snapshot = await upsert_account(id, language_code)
+
+    return snapshot.to_model()
+
+
+def forget_account(account: Account):
+    '''
+    Removes the account from the cache once the changes are committed,
+    a removal before the commit lets another update cache the old row
+    '''
+    on_commit(partial(accounts.delete, account.id))
+
+
+@threaded
+def save_account(account: Account, *fields: Field):
+    '''
+    Updates only the given columns, the account may be built from a cached
+    snapshot whose other columns have been changed since by another process
+    '''
+    account.save(only=fields)
+    forget_account(account)
+
+
+@threaded
+def count_objects(account: Account) -> tuple[int, int, int]:
+    '''
+    Returns the number of folders, tasks and completed tasks of the account
+    '''
+    counter = Counter.get_or_none(Counter.account == account)
+
+    if counter is None:
+        return 0, 0, 0
+    return counter.folders, counter.tasks, counter.completed
+
+
+@threaded
+def report_version(account_id: int) -> int:
+    '''
+    Returns the version of the data of the reports of the account,
+    which changes with every change of its time records
+    '''
+    counter = Counter.get_or_none(Counter.account == account_id)
+    return counter.version if counter is not None else 0
+
+
+# Folder
+
+def cut(items: list, limit: int, backward: bool) -> tuple[list, bool]:
+    '''
+    Trims the page fetched with one extra item, which shows whether there
+    are more items further in the direction of the fetching
+    '''
+    more = len(items) > limit
+    items = items[:limit]
+
+    if backward:
+        items.reverse()
+    return items, more
+
+
+def folder_page(
+    account: Account,
+    limit: int,
+    cursor: int | None = None,
+    backward: bool = False
+) -> ModelSelect:
+    '''
+    Query of the page of list_folders with one extra folder
+    '''
+    query = account.folders.order_by(Folder.name, Folder.id)  # type: ignore
+
+    if cursor is not None:
+        anchor = Folder.select(Folder.name, Folder.id).where(
+            Folder.id == cursor, Folder.account == account
+        )
+        key = Tuple(Folder.name, Folder.id)
+
+        if backward:
+            query = query.where(key < anchor).order_by(
+                Folder.name.desc(), Folder.id.desc()  # type: ignore
+            )
+        else:
+            query = query.where(key > anchor)
+
+    return query.limit(limit + 1)
+
+
+@threaded
+def list_folders(
+    account: Account,
+    limit: int,
+    cursor: int | None = None,
+    backward: bool = False
+) -> tuple[list[Folder], bool]:
+    '''
+    Returns a page of folders ordered by name following (or preceding if
+    backward) the folder with the cursor id, and whether there are more
+    folders in that direction
+    '''
+    query = folder_page(account, limit, cursor, backward)
+    return cut(list(query), limit, backward)
+
+
+@threaded
+def get_folder(account: Account, id: int) -> Folder:
+    '''
+    Raises DoesNotExist if the account has no folder with the given id
+    '''
+    filter = Folder.id == id  # type: ignore
+    return account.folders.where(filter).get()  # type: ignore
+
+
+@threaded
+def create_folder(
+    account: Account, name: str, description: str | None
+) -> Folder:
+    return Folder.create(
+        name=name,
+        account=account,
+        description=description
+    )
+
+
+@threaded
+def update_folder(
+    account: Account, id: int, name: str, description: str | None
+) -> Folder:
+    filter = Folder.id == id  # type: ignore
+    folder = account.folders.where(filter).get()  # type: ignore
+
+    folder.name = name
+    if description:
+        folder.description = description
+    folder.save()
+
+    # The cached account may contain the old name of the folder
+    forget_account(account)
+    return folder
+
+
+@threaded
+def delete_folder(account: Account, id: int) -> Folder:
+    filter = Folder.id == id  # type: ignore
+    folder = account.folders.where(filter).get()  # type: ignore
+
+    if account.active_folder == folder:
+        account.active_folder = None  # type: ignore
+        account.save(only=[Account.active_folder])
+
+    folder.delete_instance()
+    forget_account(account)
+    return folder
+
+
+@threaded
+def set_active_folder(account: Account, id: int) -> Folder | None:
+    '''
+    Makes the folder with the given id active, 0 means the main folder
+    '''
+    folder = None
+    if id != 0:
+        filter = Folder.id == id  # type: ignore
+        folder = account.folders.where(filter).get()  # type: ignore
+
+    account.active_folder = folder  # type: ignore
+    account.save(only=[Account.active_folder])
+
+    forget_account(account)
+    return folder
+
+
+# Task
+
+def open_tasks(account: Account, folder: Folder | None) -> ModelSelect:
+    '''
+    Query of incomplete tasks of the folder (None is the main folder)
+    ordered from newest to oldest
+    '''
+    return (
+        Task
+        .select()
+        .where(
+            Task.account == account,
+            Task.folder == folder,
+            Task.is_done == False  # noqa
+        )
+        .order_by(Task.created_at.desc(), Task.id.desc())  # type: ignore
+    )
+
+
+def task_page(
+    account: Account,
+    folder: Folder | None,
+    limit: int,
+    cursor: tuple[datetime, int] | None = None,
+    backward: bool = False
+) -> ModelSelect:
+    '''
+    Query of the page of list_tasks with one extra task
+    '''
+    query = open_tasks(account, folder)
+
+    if cursor is not None:
+        key = Tuple(Task.created_at, Task.id)
+
+        if backward:
+            query = query.where(key > Tuple(*cursor)).order_by(
+                Task.created_at, Task.id
+            )
+        else:
+            query = query.where(key < Tuple(*cursor))
+
+    return query.limit(limit + 1)
+
+
+@threaded
+def list_tasks(
+    account: Account,
+    folder: Folder | None,
+    limit: int,
+    cursor: tuple[datetime, int] | None = None,
+    backward: bool = False
+) -> tuple[list[Task], bool]:
+    '''
+    Returns a page of incomplete tasks of the folder following (or
+    preceding if backward) the cursor (creation date and id of a task),
+    and whether there are more tasks in that direction
+    '''
+    query = task_page(account, folder, limit, cursor, backward)
+    return cut(list(query), limit, backward)
+
+
+def task_query(account_id: int, id: int) -> ModelSelect:
+    '''
+    Query of find_task
+    '''
+    has_durations = fn.EXISTS(
+        Duration.select(SQL('1')).where(Duration.task == Task.id)
+    )
+    return (
+        Task
+        .select(
+            Task,
+            Folder.id,
+            Folder.name,
+            Account.id,
+            Account.timezone,
+            Account.language_code,
+            has_durations.alias('has_durations')
+        )
+        .join_from(Task, Folder, JOIN.LEFT_OUTER)
+        .join_from(Task, Account)
+        # Does not depend on the account's active folder
+        .where(Task.id == id, Task.account == account_id)
+    )
+
+
+def find_task(account_id: int, id: int) -> Task | None:
+    '''
+    Loads everything needed to display the task with a single query: the
+    task, the name of its folder, the settings of the account, and whether
+    the task has time records (the has_durations attribute)
+    '''
+    task = task_query(account_id, id).first()
+
+    if task is not None and task.folder_id is None:  # type: ignore
+        # Main folder, the empty joined instance is discarded
+        task.folder = None
+    return task
+
+
+@threaded
+def get_task(account: Account, id: int) -> Task | None:
+    return find_task(account.id, id)
+
+
+@threaded
+def create_task(
+    account: Account, folder: Folder, name: str, description: str | None
+) -> Task:
+    task = Task.create(
+        account=account,
+        folder=folder,
+        name=name,
+        description=description,
+    )
+    task.has_durations = False
+    return task
+
+
+@threaded
+def update_task(
+    account: Account, id: int, name: str, description: str | None
+) -> Task | None:
+    task = find_task(account.id, id)
+    if task is None:
+        return None
+
+    task.name = name
+    if description:
+        task.description = description
+    task.save()
+
+    return task
+
+
+@threaded
+def mark_done(task: Task):
+    task.is_done = True  # type: ignore
+    task.save()
+
+
+@threaded
+def delete_task(task: Task):
+    task.delete_instance()
+
+
+# Duration
+
+@threaded
+def set_notes(account: Account, id: int, notes: str) -> bool:
+    '''
+    Returns False if the account has no time record with the given id
+    '''
+    query = Duration.update(notes=notes).where(
+        Duration.id == id, Duration.account == account
+    )
+    return bool(query.execute())
+
+
+# Timer
+
+def now() -> datetime:
+    # The columns hold naive UTC dates
+    return utc_now().replace(tzinfo=None)
+
+
+def lock_timer(task: Task) -> Timer | None:
+    '''
+    Selects the timer of the task locking its row until the end of the
+    transaction, so concurrent pauses and stops are applied one by one
+    '''
+    timer = Timer.select().where(Timer.task == task).for_update().first()
+
+    if timer is not None:
+        timer.task = task
+    return timer
+
+
+def check_running(task: Task):
+    '''
+    When the time records of all tasks of the account must not intersect,
+    the periods of two running timers would always do, so that neither of
+    them could be recorded. ValueError is raised if another timer of the
+    account is running. The account row is locked until the end of the
+    transaction, so concurrent starts and resumes are checked one by one.
+    '''
+    if getattr(settings, 'DURATION_OVERLAP_SCOPE', 'task') != 'account':
+        return
+
+    (
+        Account
+        .select(Account.id)
+        .where(Account.id == task.account_id)  # type: ignore
+        .for_update('FOR NO KEY UPDATE')
+        .execute()
+    )
+    running = (
+        Timer
+        .select(Timer.id, Task.name)
+        .join(Task)
+        .where(
+            Timer.account == task.account_id,  # type: ignore
+            Timer.task != task,
+            Timer.resumed_at.is_null(False)  # type: ignore
+        )
+        .first()
+    )
+
+    if running is not None:
+        raise ValueError(_(
+            'The timer of the task "%s" is running. Pause or '
+            'stop it before starting another one.'
+        ) % running.task.name)
+
+
+@threaded
+def start_timer(task: Task) -> tuple[Timer, bool]:
+    '''
+    Starts the timer of the task unless it already has one, returns the
+    timer and whether it has been started. ValueError is raised if it
+    can't run together with another timer, see check_running.
+    '''
+    created = 0
+
+    with database.atomic():
+        if not Timer.select().where(Timer.task == task).exists():
+            check_running(task)
+
+            started_at = now()
+            created = (
+                Timer
+                .insert(
+                    task=task,
+                    account=task.account_id,  # type: ignore
+                    started_at=started_at,
+                    resumed_at=started_at
+                )
+                .on_conflict_ignore()
+                .execute()
+            )
+
+    timer = Timer.get(Timer.task == task)
+    timer.task = task
+
+    return timer, bool(created)
+
+
+@threaded
+def list_timers(account: Account) -> list[Timer]:
+    '''
+    Returns the timers of the account (running and paused) in the order
+    they were started, with the names of their tasks, for the status view
+    '''
+    return list(
+        Timer
+        .select(Timer, Task.id, Task.name)
+        .join(Task)
+        .where(Timer.account == account)
+        .order_by(Timer.started_at)
+    )
+
+
+@threaded
+def get_timer(task: Task) -> Timer | None:
+    timer = Timer.get_or_none(Timer.task == task)
+
+    if timer is not None:
+        timer.task = task
+    return timer
+
+
+@threaded
+def pause_timer(task: Task) -> Timer | None:
+    '''
+    Records the running period of the timer, ValueError is raised
+    if the record can't be registered
+    '''
+    with database.atomic():
+        timer = lock_timer(task)
+
+        if timer is not None and timer.is_running:
+            timer.close(now())
+            timer.save()
+
+    return timer
+
+
+@threaded
+def resume_timer(task: Task) -> Timer | None:
+    '''
+    ValueError is raised if the timer can't run together with
+    another one of the account, see check_running
+    '''
+    with database.atomic():
+        timer = lock_timer(task)
+
+        if timer is not None and not timer.is_running:
+            check_running(task)
+            timer.resumed_at = now()
+            timer.save()
+
+    return timer
+
+
+@threaded
+def stop_timer(task: Task) -> tuple[Timer, Duration | None] | None:
+    '''
+    Records the running period of the timer and deletes it in one
+    transaction, ValueError is raised if the record can't be registered
+    and the timer is kept
+    '''
+    with database.atomic():
+        timer = lock_timer(task)
+        if timer is None:
+            return None
+
+        duration = timer.close(now())
+        timer.delete_instance()
+
+    return timer, duration
+
+
+@threaded
+def discard_timer(task: Task) -> bool:
+    '''
+    Deletes the timer without recording its running period
+    '''
+    return bool(Timer.delete().where(Timer.task == task).execute())
@@ -1,3 +1,12 @@
+'''
+States of conversations and the payloads stored with them. Payloads hold
+only ids, epoch timestamps and message references, so they are small and
+can be serialized to an external FSM storage.
+'''
+
+from dataclasses import dataclass, fields
+from typing import ClassVar, NamedTuple, TypeVar
+
 from aiogram.fsm.state import StatesGroup, State
 
 
@@ -21,9 +30,122 @@ class UpdateTask(StatesGroup):
     typing = State()
 
 
-class CreateDuration(StatesGroup):
+class DurationNotes(StatesGroup):
     typing = State()
 
 
 class CreateReminder(StatesGroup):
     typing = State()
+
+
+T = TypeVar('T', bound='Payload')
+
+
+class MessageRef(NamedTuple):
+    chat_id: int
+    message_id: int
+
+    @classmethod
+    def of(cls, message) -> 'MessageRef':
+        return cls(message.chat.id, message.message_id)
+
+    def as_kwargs(self) -> dict[str, int]:
+        return self._asdict()
+
+
+@dataclass
+class Payload:
+    '''
+    Base class of the payloads. The version is stored along with the
+    fields, and data stored by another version is not loaded at all.
+    '''
+    version: ClassVar[int] = 1
+
+    def dump(self) -> dict:
+        data = {'v': self.version}
+
+        for field in fields(self):
+            value = getattr(self, field.name)
+            if value is not None:
+                data[field.name] = value
+
+        return data
+
+    @classmethod
+    def load(cls: type[T], data: dict) -> T | None:
+        '''
+        Returns None if the data does not match the payload
+        '''
+        if data.get('v') != cls.version:
+            return None
+
+        values = {}
+        for field in fields(cls):
+            if field.name not in data:
+                continue
+
+            value = data[field.name]
+            # Message references become lists after serialization
+            if isinstance(value, (list, tuple)):
+                value = MessageRef(*value)
+            values[field.name] = value
+
+        try:
+            return cls(**values)
+        except TypeError:
+            return None
+
+
+@dataclass
+class DraftTaskData(Payload):
+    '''
+    Task proposed to be created from an unhandled message (without state)
+    '''
+    name: str
+    description: str | None = None
+
+
+@dataclass
+class CreateTaskData(Payload):
+    explanation: MessageRef | None = None
+
+
+@dataclass
+class UpdateTaskData(Payload):
+    task_id: int
+    explanation: MessageRef | None = None
+    # Message with the task details to be updated
+    source: MessageRef | None = None
+
+
+@dataclass
+class DurationNotesData(Payload):
+    '''
+    Time record created by a stopped timer, to which notes can be added
+    '''
+    duration_id: int
+    explanation: MessageRef | None = None
+
+
+@dataclass
+class CreateReminderData(Payload):
+    task_id: int
+
+
+@dataclass
+class ChangeTimezoneData(Payload):
+    explanation: MessageRef | None = None
+
+
+@dataclass
+class UpdateFolderData(Payload):
+    folder_id: int
+    explanation: MessageRef | None = None
+
+
+@dataclass
+class DeleteFolderData(Payload):
+    '''
+    Message with the folder details, stored without state
+    '''
+    source: MessageRef | None = None
@@ -0,0 +1,42 @@
+'''
+FSM storages. With FSM_STORAGE = 'redis' in settings.py the states and the
+data of conversations are kept in Redis, so they survive restarts and are
+shared between several webhook processes.
+'''
+
+import json
+import settings
+from typing import Any
+
+from redis.asyncio import Redis
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+
+
+def dumps(data: dict[str, Any]) -> str:
+    '''
+    Compact JSON of the data of a conversation, without the spaces after
+    the separators and with the text as is instead of escape sequences
+    '''
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+
+def create() -> BaseStorage:
+    '''
+    Creates the FSM storage according to settings.py file
+    '''
+    if getattr(settings, 'FSM_STORAGE', 'memory') != 'redis':
+        return MemoryStorage()
+
+    url = getattr(settings, 'FSM_REDIS_URL', settings.BROKER)
+    # Abandoned conversations are removed after a day by default
+    ttl = getattr(settings, 'FSM_TTL', 24 * 60 * 60)
+
+    return RedisStorage(
+        Redis.from_url(url),
+        key_builder=DefaultKeyBuilder(prefix='fsm'),
+        state_ttl=ttl,
+        data_ttl=ttl,
+        json_dumps=dumps
+    )
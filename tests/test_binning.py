@@ -0,0 +1,204 @@
+'''
+Tests of reports.binning against add_time, the loop over the hours of
+each record the today report used before. It is copied here unchanged,
+as it has been removed from reports.utils. It worked with the UTC dates,
+so it is compared on UTC days, and the cases where it was wrong (the
+first hour of a record assigned instead of added, the time after
+midnight dropped) check the correct values instead.
+
+Usage: python -m unittest discover tests
+'''
+
+import pytz
+import unittest
+from datetime import date, datetime, timedelta
+
+from reports import binning
+
+
+DAY = date(2024, 5, 10)
+
+
+class Record:
+    def __init__(self, start: datetime, end: datetime) -> None:
+        self.start = start
+        self.end = end
+
+    @property
+    def value(self) -> timedelta:
+        return self.end - self.start
+
+
+def minutes(delta: timedelta) -> int:
+    return int(delta.total_seconds() // 60)
+
+
+def add_time(timeline: list[int], duration: Record):
+    hour = duration.start.hour
+
+    if hour == duration.end.hour:
+        timeline[hour] += minutes(duration.value)
+        return
+
+    following = duration.start \
+        .replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    timeline[hour] = minutes(following - duration.start)
+
+    # Next day
+    if following.hour == 0:
+        return
+
+    hour += 1
+    remainder = minutes(duration.end - following)
+
+    while remainder >= 60:
+        timeline[hour] += 60
+
+        remainder -= 60
+        hour += 1
+        if hour > 23:
+            return
+
+    if hour < 24:
+        timeline[hour] += remainder
+
+
+def at(hour: int, minute: int = 0, day: date = DAY) -> datetime:
+    return datetime(day.year, day.month, day.day, hour, minute)
+
+
+def reference(records: list[tuple[datetime, datetime]]) -> list[int]:
+    timeline = [0] * 24
+    for start, end in records:
+        add_time(timeline, Record(start, end))
+    return timeline
+
+
+def binned(
+    records: list[tuple[datetime, datetime | None]],
+    day: date = DAY,
+    timezone=pytz.utc,
+    **kwargs
+) -> list[float]:
+    starts = [start for start, __ in records]
+    ends = [end for __, end in records]
+    return binning.timeline(starts, ends, day, timezone, **kwargs)
+
+
+class AddTimeTest(unittest.TestCase):
+    def assert_same(self, records: list[tuple[datetime, datetime]]):
+        self.assertEqual(binned(records), reference(records))
+
+    def test_within_hour(self):
+        self.assert_same([(at(10, 5), at(10, 35))])
+
+    def test_whole_hour(self):
+        self.assert_same([(at(7), at(8))])
+
+    def test_multiple_hours(self):
+        self.assert_same([(at(9, 40), at(12, 20))])
+
+    def test_records_in_different_hours(self):
+        self.assert_same([
+            (at(1, 10), at(1, 50)),
+            (at(6, 30), at(8, 15)),
+            (at(20, 0), at(20, 45)),
+        ])
+
+    def test_from_midnight(self):
+        self.assert_same([(at(0), at(2, 30))])
+
+    def test_until_midnight(self):
+        self.assert_same([(at(22, 15), at(0, day=DAY + timedelta(days=1)))])
+
+    def test_across_midnight_on_first_day(self):
+        following = DAY + timedelta(days=1)
+        self.assert_same([(at(23, 30), at(1, 15, following))])
+
+    def test_open_record(self):
+        now = at(16, 25)
+        self.assertEqual(
+            binned([(at(14, 10), None)], now=now),
+            reference([(at(14, 10), now)])
+        )
+
+
+class BinningTest(unittest.TestCase):
+    def test_across_midnight_on_second_day(self):
+        # add_time counted the record on the day it started only
+        following = DAY + timedelta(days=1)
+        timeline = binned([(at(23, 30), at(1, 15, following))], following)
+
+        self.assertEqual(timeline[:3], [60, 15, 0])
+        self.assertEqual(sum(timeline), 75)
+
+    def test_records_sharing_first_hour(self):
+        # add_time assigned the first hour of the second record
+        records = [(at(10), at(10, 20)), (at(10, 30), at(11, 10))]
+
+        self.assertEqual(reference(records)[10:12], [30, 10])
+        self.assertEqual(binned(records)[10:12], [50, 10])
+
+    def test_open_record_until_now(self):
+        now = at(9, 45)
+        timeline = binned([(at(8, 30), None), (at(6), at(7))], now=now)
+
+        self.assertEqual(timeline[6:10], [60, 0, 30, 45])
+
+    def test_open_record_started_before(self):
+        now = at(0, 40)
+        started = at(23, 0, DAY - timedelta(days=1))
+
+        self.assertEqual(binned([(started, None)], now=now)[0], 40)
+
+    def test_no_records(self):
+        self.assertEqual(binned([]), [0.0] * 24)
+
+    def test_quarters(self):
+        timeline = binned([(at(10, 5), at(10, 35))], length=15)
+
+        self.assertEqual(len(timeline), 96)
+        self.assertEqual(timeline[40:43], [10, 15, 5])
+
+    def test_seconds(self):
+        start = at(10) + timedelta(seconds=30)
+        timeline = binned([(start, at(10, 1))])
+
+        self.assertEqual(timeline[10], 0.5)
+
+    def test_length_not_dividing_day(self):
+        with self.assertRaises(ValueError):
+            binned([], length=7)
+
+    def test_time_zone(self):
+        kolkata = pytz.timezone('Asia/Kolkata')
+        # 04:30 - 06:00 local time
+        timeline = binned([(at(23, 0, DAY - timedelta(days=1)), at(0, 30))],
+                          timezone=kolkata)
+
+        self.assertEqual(timeline[4:6], [30, 60])
+        self.assertEqual(sum(timeline), 90)
+
+    def test_clocks_forward(self):
+        kiev = pytz.timezone('Europe/Kiev')
+        spring = date(2024, 3, 31)
+        # The whole day, the local hour 3 is skipped
+        start = datetime(2024, 3, 30, 22)
+        timeline = binned([(start, datetime(2024, 3, 31, 21))], spring, kiev)
+
+        self.assertEqual(timeline[3], 0)
+        self.assertEqual(sum(timeline), 23 * 60)
+
+    def test_clocks_back(self):
+        kiev = pytz.timezone('Europe/Kiev')
+        autumn = date(2024, 10, 27)
+        # The whole day, the local hour 3 is repeated
+        start = datetime(2024, 10, 26, 21)
+        timeline = binned([(start, datetime(2024, 10, 27, 22))], autumn, kiev)
+
+        self.assertEqual(timeline[3], 120)
+        self.assertEqual(sum(timeline), 25 * 60)
+
+
+if __name__ == '__main__':
+    unittest.main()